@@ -0,0 +1,90 @@
+# bench_agent.py
+#
+# Replays the scripted sessions in benchmarks/fixtures through the real agent
+# loop in main.py, using the offline ReplayClient against the calculator working
+# directory. Reports wall time, time spent in tools, the loop's own overhead
+# (everything that is neither the model nor a tool) and the final history size.
+# No API key or network access is needed. Run from the repository root:
+#
+#     python -m benchmarks.bench_agent [--repeat N] [fixture.json ...]
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import statistics
+import time
+
+from google.genai import types
+
+import main as agent
+from clients import ReplayClient
+from history import message_chars
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def run_session(path):
+    with open(path, "r") as f:
+        prompt = json.load(f)["prompt"]
+    agent.client = ReplayClient(path)
+
+    # Time spent inside tool dispatch, measured around run_function_calls
+    tool_seconds = 0.0
+    run_function_calls = agent.run_function_calls
+
+    def timed_run_function_calls(*args, **kwargs):
+        nonlocal tool_seconds
+        started = time.perf_counter()
+        try:
+            return run_function_calls(*args, **kwargs)
+        finally:
+            tool_seconds += time.perf_counter() - started
+
+    agent.run_function_calls = timed_run_function_calls
+    messages = [types.Content(role="user", parts=[types.Part(text=prompt)])]
+    try:
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            history = agent.run_agent(messages, prompt)
+        wall = time.perf_counter() - started
+    finally:
+        agent.run_function_calls = run_function_calls
+
+    return {
+        "wall": wall,
+        "tools": tool_seconds,
+        "overhead": wall - tool_seconds,
+        "messages": len(messages),
+        "history_chars": sum(message_chars(message) for message in messages),
+        "history_tokens": history.total_tokens(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("fixtures", nargs="*")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    fixtures = args.fixtures or sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.json")))
+
+    print(
+        f"{'session':<20} {'wall ms':>9} {'tools ms':>9} {'overhead ms':>12} "
+        f"{'messages':>9} {'history chars':>14} {'history tokens':>15}"
+    )
+    for path in fixtures:
+        runs = [run_session(path) for _ in range(args.repeat)]
+        median = {key: statistics.median(run[key] for run in runs) for key in ("wall", "tools", "overhead")}
+        last = runs[-1]
+        name = os.path.splitext(os.path.basename(path))[0]
+        print(
+            f"{name:<20} {1000 * median['wall']:>9.1f} {1000 * median['tools']:>9.1f} "
+            f"{1000 * median['overhead']:>12.2f} {last['messages']:>9} "
+            f"{last['history_chars']:>14} {last['history_tokens']:>15}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# bench_startup.py
+#
+# Cold-start cost of the agent: wall time of `python main.py` on the usage-error
+# path (nothing but startup and exit) and `python -X importtime -c "import main"`
+# broken down by the modules that cost the most. With --save, one JSON line per
+# run is appended to benchmarks/startup_history.jsonl so cold start can be
+# tracked across commits. Run from the repository root:
+#
+#     python -m benchmarks.bench_startup [--repeat N] [--top N] [--save]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HISTORY_FILE = os.path.join(os.path.dirname(__file__), "startup_history.jsonl")
+
+
+def usage_path_seconds():
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "main.py"], capture_output=True)
+    return time.perf_counter() - started
+
+
+def import_times():
+    # -X importtime writes "import time: self [us] | cumulative | name" to stderr
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True,
+        text=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def git_commit():
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--save", action="store_true")
+    args = parser.parse_args()
+
+    wall = [usage_path_seconds() for _ in range(args.repeat)]
+    runs = [import_times() for _ in range(args.repeat)]
+    import_main_us = statistics.median(run["main"][1] for run in runs)
+    sdk_loaded = any("google.genai" in run for run in runs)
+
+    print(f"python main.py (usage error): median {1000 * statistics.median(wall):.1f} ms, min {1000 * min(wall):.1f} ms")
+    print(f"import main: median {import_main_us / 1000:.1f} ms (google.genai imported: {sdk_loaded})")
+    print()
+    print(f"{'module':<40} {'cumulative ms':>14} {'self ms':>9}")
+    slowest = sorted(runs[-1].items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"{name:<40} {cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}")
+
+    if args.save:
+        record = {
+            "time": time.time(),
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "usage_path_ms": 1000 * statistics.median(wall),
+            "import_main_ms": import_main_us / 1000,
+            "sdk_imported": sdk_loaded,
+        }
+        with open(HISTORY_FILE, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"\nAppended to {HISTORY_FILE}")
+
+
+if __name__ == "__main__":
+    main()
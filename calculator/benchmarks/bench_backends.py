@@ -0,0 +1,48 @@
+# bench_backends.py
+#
+# Compares the cost of each numeric backend on integer-only and fractional
+# expressions, with the compile cache warm so only arithmetic is measured.
+# Operands are bound through the variable x so constant folding cannot
+# precompute the whole result.
+# Run from the calculator directory:
+#
+#     python -m benchmarks.bench_backends
+
+import argparse
+import timeit
+
+from pkg.calculator import BACKENDS, Calculator
+
+EXPRESSIONS = {
+    "integer": ("12 * x + 3 * (41 - x) * 2 - 18 + 250 * x", "7"),
+    "integer+div": ("12 * x + 3 * (41 - x) / 2 - 18 + 250 / x", "7"),
+    "fractional": ("1.25 * x + 3.1 * (4.1 - x) / 2.2 - 1.8 + 0.25 / x", "7.5"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=20_000)
+    parser.add_argument("--precision", type=int, default=28)
+    args = parser.parse_args()
+
+    print(f"{'backend':<10} {'expression':<12} {'ns/eval':>10} result")
+    for backend in BACKENDS:
+        calculator = Calculator(backend=backend, precision=args.precision)
+        for name, (expression, x) in EXPRESSIONS.items():
+            variables = {"x": int(x) if x.isdigit() else calculator._number(x)}
+            result = calculator.evaluate(expression, variables)
+            seconds = min(
+                timeit.repeat(
+                    lambda: calculator.evaluate(expression, variables),
+                    number=args.number,
+                    repeat=3,
+                )
+            )
+            print(
+                f"{backend:<10} {name:<12} {seconds / args.number * 1e9:>10.0f} {result!r}"
+            )
+
+
+if __name__ == "__main__":
+    main()
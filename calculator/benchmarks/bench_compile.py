@@ -0,0 +1,49 @@
+# bench_compile.py
+#
+# Per-call cost of the plan interpreter (Calculator.evaluate) against the
+# generated Python function from Calculator.compile for the same formula.
+# Run from the calculator directory:
+#
+#     python -m benchmarks.bench_compile
+
+import argparse
+import timeit
+
+from pkg.calculator import Calculator
+
+FORMULAS = [
+    "x * 2 + 1",
+    "(x + y) * (x - y) / 2 + x * y",
+    "x * 1.07 - y * 0.93 + (x + y) * (x + y) / 4 - 12.5 * z",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=200_000)
+    args = parser.parse_args()
+
+    calculator = Calculator()
+    bindings = {"x": 3.5, "y": 1.25, "z": 0.5}
+    print(f"{'formula':<58} {'evaluate ns':>12} {'compiled ns':>12}")
+    for expression in FORMULAS:
+        formula = calculator.compile(expression)
+        arguments = [bindings[name] for name in formula.variables]
+        interpreted = min(
+            timeit.repeat(
+                lambda: calculator.evaluate(expression, bindings),
+                number=args.number,
+                repeat=3,
+            )
+        )
+        compiled = min(
+            timeit.repeat(lambda: formula(*arguments), number=args.number, repeat=3)
+        )
+        print(
+            f"{expression:<58} {interpreted / args.number * 1e9:>12.0f} "
+            f"{compiled / args.number * 1e9:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# bench_render.py
+#
+# Rendering a large result table: one render() call per result against a
+# single render_many() pass, in box and compact modes.
+# Run from the calculator directory:
+#
+#     python -m benchmarks.bench_render --rows 100000
+
+import argparse
+import random
+import timeit
+
+from pkg.render import render, render_many
+
+
+def build_pairs(rows, seed=0):
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(rows):
+        a, b = rng.randint(1, 9999), rng.randint(1, 99)
+        pairs.append((f"{a} / {b}", a / b))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pairs = build_pairs(args.rows)
+    cases = [
+        ("render per call", lambda: "\n".join(render(e, r) for e, r in pairs)),
+        ("render_many", lambda: render_many(pairs)),
+        (
+            "render per call, compact",
+            lambda: "\n".join(render(e, r, compact=True) for e, r in pairs),
+        ),
+        ("render_many, compact", lambda: render_many(pairs, compact=True)),
+    ]
+    print(f"{'path':<26} {'seconds':>10} {'ns/row':>10}")
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        print(f"{name:<26} {seconds:>10.4f} {seconds / args.rows * 1e9:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# bench_suite.py
+#
+# Scaling suite for the real Calculator.evaluate and render: expression length
+# (10 to 100k tokens), operator mix, deep precedence chains and repeated
+# formulas. Reports ops/sec, cost per token and peak memory (tracemalloc) per
+# case. --save writes the results as JSON; --compare checks them against an
+# earlier file and exits non-zero on a regression. Run from the calculator
+# directory:
+#
+#     python -m benchmarks.bench_suite --save before.json
+#     python -m benchmarks.bench_suite --compare before.json [--threshold 0.2]
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from pkg.calculator import Calculator
+from pkg.render import render
+from pkg.tokenizer import tokenize
+
+LENGTHS = [10, 100, 1_000, 10_000, 100_000]
+MIX_TOKENS = 1_000
+CHAIN_DEPTHS = [100, 1_000, 10_000]
+
+
+def operands(rng, count, floats):
+    # Floats stay near 1 so long products and quotients neither overflow nor
+    # turn into huge integers
+    if floats:
+        return [f"{rng.uniform(0.5, 1.5):.3f}" for _ in range(count)]
+    return [str(rng.randint(1, 999)) for _ in range(count)]
+
+
+def chain(tokens, operators, seed=0, floats=True):
+    # A flat "a op b op c ..." expression of about the requested token count
+    rng = random.Random(seed)
+    values = operands(rng, max(tokens // 2 + 1, 2), floats)
+    parts = [values[0]]
+    for value in values[1:]:
+        parts.append(rng.choice(operators))
+        parts.append(value)
+    return " ".join(parts)
+
+
+def with_unary_minus(tokens, seed=0):
+    rng = random.Random(seed)
+    values = operands(rng, max(tokens // 3 + 1, 2), True)
+    return " + ".join(f"-{value}" if rng.random() < 0.5 else value for value in values)
+
+
+def left_nested(depth):
+    # ((((1 + 2) * 3) - 4) ...): every close paren unwinds one level
+    operators = ["+", "*", "-", "/"]
+    body = "".join(f" {operators[i % 4]} {i % 9 + 1})" for i in range(depth))
+    return "(" * depth + "1" + body
+
+
+def right_nested(depth):
+    # 1 + (2 * (3 - (4 / ...))): the operator stack grows to the full depth
+    operators = ["+", "*", "-", "/"]
+    head = "".join(f"{i % 9 + 1} {operators[i % 4]} (" for i in range(depth))
+    return head + "1" + ")" * depth
+
+
+def precedence_ladder(tokens):
+    # 1 + 2 * 3 - 4 / 5 ...: operators cycle so precedence changes at every one
+    operators = ["+", "*", "-", "/"]
+    values = operands(random.Random(1), max(tokens // 2 + 1, 2), True)
+    parts = [values[0]]
+    for i, value in enumerate(values[1:]):
+        parts.append(operators[i % 4])
+        parts.append(value)
+    return " ".join(parts)
+
+
+def workloads():
+    # (workload, case, expression, variables or None, cache_size)
+    cases = []
+    for length in LENGTHS:
+        cases.append(("length", f"{length}", chain(length, ["+", "-", "*", "/"]), None, 0))
+
+    cases.append(("operator_mix", "add_sub_int", chain(MIX_TOKENS, ["+", "-"], floats=False), None, 0))
+    cases.append(("operator_mix", "mul_div", chain(MIX_TOKENS, ["*", "/"]), None, 0))
+    cases.append(("operator_mix", "mixed", chain(MIX_TOKENS, ["+", "-", "*", "/"]), None, 0))
+    cases.append(("operator_mix", "unary_minus", with_unary_minus(MIX_TOKENS), None, 0))
+
+    for depth in CHAIN_DEPTHS:
+        cases.append(("precedence", f"left_nested_{depth}", left_nested(depth), None, 0))
+        cases.append(("precedence", f"right_nested_{depth}", right_nested(depth), None, 0))
+        cases.append(("precedence", f"ladder_{2 * depth}", precedence_ladder(2 * depth), None, 0))
+
+    formula = "(x + y) * (x - y) / 2 + x * y - 1.5 * z"
+    bindings = {"x": 3.5, "y": 1.25, "z": 0.5}
+    cases.append(("repeated", "formula_cold", formula, bindings, 0))
+    cases.append(("repeated", "formula_cached", formula, bindings, 256))
+    return cases
+
+
+def measure(function, min_time):
+    # Calls function until min_time has passed; returns seconds per call
+    runs = 0
+    started = time.perf_counter()
+    while True:
+        function()
+        runs += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            return elapsed / runs
+
+
+def peak_memory(function):
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(workload, case, expression, variables, cache_size, tokens, min_time):
+    calculator = Calculator(cache_size=cache_size)
+    evaluate = lambda: calculator.evaluate(expression, variables)
+    result = evaluate()
+
+    seconds = measure(evaluate, min_time)
+    # Rendering is measured on its own so that evaluate's numbers stay comparable
+    render_seconds = measure(lambda: render(expression, result), min_time)
+
+    return {
+        "workload": workload,
+        "case": case,
+        "tokens": tokens,
+        "ops_per_sec": 1 / seconds,
+        "ns_per_token": 1e9 * seconds / tokens,
+        "render_ops_per_sec": 1 / render_seconds,
+        "peak_bytes": peak_memory(evaluate),
+    }
+
+
+def compare(results, baseline_path, threshold):
+    # Flags cases that got slower, or use more memory, by more than threshold
+    with open(baseline_path, "r") as f:
+        baseline = {(r["workload"], r["case"]): r for r in json.load(f)["results"]}
+
+    regressions = []
+    for result in results:
+        before = baseline.get((result["workload"], result["case"]))
+        if before is None:
+            continue
+        for key, higher_is_better in (("ops_per_sec", True), ("render_ops_per_sec", True), ("peak_bytes", False)):
+            old, new = before[key], result[key]
+            if not old:
+                continue
+            change = (old - new) / old if higher_is_better else (new - old) / old
+            if change > threshold:
+                regressions.append(f"{result['workload']}/{result['case']} {key}: {old:.4g} -> {new:.4g} ({100 * change:.0f}% worse)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds spent timing each case")
+    parser.add_argument("--max-tokens", type=int, default=None, help="skip cases longer than this")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier --save to check against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'workload':<14} {'case':<20} {'tokens':>8} {'ops/sec':>12} {'ns/token':>10} {'render/sec':>12} {'peak KiB':>10}")
+    for workload, case, expression, variables, cache_size in workloads():
+        tokens = sum(1 for _ in tokenize(expression))
+        if args.max_tokens and tokens > args.max_tokens:
+            continue
+        result = run_case(workload, case, expression, variables, cache_size, tokens, args.min_time)
+        results.append(result)
+        print(
+            f"{workload:<14} {case:<20} {result['tokens']:>8} {result['ops_per_sec']:>12.1f} "
+            f"{result['ns_per_token']:>10.1f} {result['render_ops_per_sec']:>12.1f} "
+            f"{result['peak_bytes'] / 1024:>10.1f}"
+        )
+
+    if args.save:
+        report = {
+            "meta": {
+                "time": time.time(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+            },
+            "results": results,
+        }
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"\nSaved {len(results)} results to {args.save}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressions against {args.compare}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.compare} (threshold {100 * args.threshold:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
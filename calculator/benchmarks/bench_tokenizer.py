@@ -0,0 +1,65 @@
+# bench_tokenizer.py
+#
+# Compares the streaming tokenizer against the old str.split path on long
+# expressions. Run from the calculator directory:
+#
+#     python -m benchmarks.bench_tokenizer --tokens 10000 100000
+
+import argparse
+import random
+import timeit
+
+from pkg.calculator import Calculator
+from pkg.tokenizer import tokenize
+
+
+def build_expression(token_count, spaced=True, seed=0):
+    rng = random.Random(seed)
+    parts = [str(rng.randint(1, 999))]
+    while len(parts) < token_count:
+        parts.append(rng.choice("+-*/"))
+        parts.append(str(rng.randint(1, 999)))
+    return (" " if spaced else "").join(parts)
+
+
+def split_path(expression):
+    # What Calculator.evaluate did before the tokenizer: split, then convert
+    # every operand with float().
+    for token in expression.strip().split():
+        if token not in "+-*/":
+            float(token)
+
+
+def tokenizer_path(expression):
+    for kind, token in tokenize(expression):
+        if kind == "number":
+            float(token)
+
+
+def bench(func, expression, repeat):
+    return min(timeit.repeat(lambda: func(expression), number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    calculator = Calculator(cache_size=0)
+    print(f"{'tokens':>8} {'path':<22} {'seconds':>10} {'ns/token':>10}")
+    for count in args.tokens:
+        spaced = build_expression(count, spaced=True)
+        compact = build_expression(count, spaced=False)
+        rows = [
+            ("str.split", bench(split_path, spaced, args.repeat)),
+            ("tokenize (spaced)", bench(tokenizer_path, spaced, args.repeat)),
+            ("tokenize (compact)", bench(tokenizer_path, compact, args.repeat)),
+            ("compile (spaced)", bench(calculator._compile, spaced, args.repeat)),
+        ]
+        for name, seconds in rows:
+            print(f"{count:>8} {name:<22} {seconds:>10.5f} {seconds / count * 1e9:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
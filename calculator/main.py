@@ -3,17 +3,80 @@
 import sys
 from pkg.calculator import Calculator
 from pkg.render import render
+from pkg.stream import evaluate_stream
+
+
+def _option(args, name, default=None):
+    if name in args:
+        index = args.index(name)
+        if index + 1 < len(args) and not args[index + 1].startswith("--"):
+            return args[index + 1]
+    return default
+
+
+def _count_option(args, name, default, minimum):
+    value = _option(args, name, default)
+    try:
+        value = int(value)
+    except ValueError:
+        return None
+    return value if value >= minimum else None
+
+
+def _usage():
+    print("Calculator App")
+    print('Usage: python main.py "<expression>"')
+    print("       python main.py --stdin [--jsonl] < expressions.txt")
+    print(
+        "       python main.py --file expressions.txt [--workers N] "
+        "[--chunk-size BYTES] [--jsonl]"
+    )
+    print('Example: python main.py "3 + 5"')
 
 
 def main():
     calculator = Calculator()
-    if len(sys.argv) <= 1:
-        print("Calculator App")
-        print('Usage: python main.py "<expression>"')
-        print('Example: python main.py "3 + 5"')
+    args = sys.argv[1:]
+
+    output_format = "jsonl" if "--jsonl" in args else "plain"
+    if "--stdin" in args:
+        evaluate_stream(calculator, sys.stdin, sys.stdout, output_format)
+        return
+
+    if "--file" in args:
+        path = _option(args, "--file")
+        workers = _count_option(args, "--workers", 0, 0)
+        chunk_size = _count_option(args, "--chunk-size", 1 << 20, 1)
+        if path is None or workers is None or chunk_size is None:
+            print(
+                "Error: --file needs a path, --workers a whole number (0 for one "
+                "per CPU) and --chunk-size a positive number of bytes"
+            )
+            _usage()
+            return
+
+        # The process pool machinery is only worth importing for --file
+        from pkg.parallel import evaluate_file, print_report
+
+        try:
+            report = evaluate_file(
+                path,
+                sys.stdout,
+                workers=workers,
+                chunk_size=chunk_size,
+                output_format=output_format,
+            )
+        except OSError as e:
+            print(f"Error: {e}")
+            return
+        print_report(report)
+        return
+
+    if not args:
+        _usage()
         return
 
-    expression = " ".join(sys.argv[1:])
+    expression = " ".join(args)
     try:
         result = calculator.evaluate(expression)
         to_print = render(expression, result)
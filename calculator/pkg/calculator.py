@@ -1,61 +1,339 @@
 # calculator.py
 
+from array import array
+from collections import OrderedDict
+from decimal import Context, Decimal, localcontext
+from fractions import Fraction
+from functools import cache
+from itertools import repeat
+
+from .codegen import generate
+from .optimizer import optimize
+from .tokenizer import tokenize
+
+
+# Numeric backends: how non-integer literals are parsed and how division
+# promotes its operands. Integer literals always stay Python ints, so
+# integer-only arithmetic is exact until a division forces promotion.
+BACKENDS = {
+    "float": (float, lambda a, b: a / b),
+    "decimal": (Decimal, lambda a, b: Decimal(a) / b),
+    "fraction": (Fraction, lambda a, b: Fraction(a) / b),
+}
+
+
 class Calculator:
-    def __init__(self):
+    def __init__(self, cache_size=256, backend="float", precision=28):
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown backend: {backend}")
+        self.backend = backend
+        self._number, divide = BACKENDS[backend]
+        # Decimal arithmetic runs inside this context so results are rounded
+        # to the requested precision rather than the thread's default.
+        self.context = Context(prec=precision) if backend == "decimal" else None
         self.operators = {
             "+": lambda a, b: a + b,
             "-": lambda a, b: a - b,
             "*": lambda a, b: a * b,
-            "/": lambda a, b: a / b,
+            "/": divide,
         }
         self.precedence = {
             "+": 1,
             "-": 1,
             "*": 2,
             "/": 2,
+            "u-": 3,
         }
+        self.unary_operators = {
+            "u-": lambda a: -a,
+        }
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._functions = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
 
-    def evaluate(self, expression):
+    def evaluate(self, expression, variables=None):
         if not expression or expression.isspace():
             return None
-        tokens = expression.strip().split()
-        return self._evaluate_infix(tokens)
+        entry, reused = self._entry(expression)
+        if self.context is not None:
+            with localcontext(self.context):
+                return self._evaluate_entry(entry, reused, variables)
+        return self._evaluate_entry(entry, reused, variables)
 
-    def _evaluate_infix(self, tokens):
-        values = []
+    def evaluate_batch(self, expression, columns):
+        # Evaluate one expression over whole columns of operands. Variables
+        # bind to equal-length sequences (NumPy arrays, array.array buffers or
+        # lists); division by zero yields NaN for that element only.
+        plan = self._compile(expression)
+        length = self._batch_length(columns)
+        numpy = _numpy()
+        if numpy is not None:
+            return self._evaluate_batch_numpy(numpy, plan, columns, length)
+        return self._evaluate_batch_python(plan, columns, length)
+
+    def compile(self, expression):
+        # Generate a native Python function for the expression. Its
+        # parameters are the expression's variables in order of appearance
+        # (see formula.variables); functions are cached like plans.
+        formula = self._functions.get(expression)
+        if formula is not None:
+            self._functions.move_to_end(expression)
+            return formula
+
+        plan = self._compile(expression)
+        promote = None if self.backend == "float" else self._number
+        formula = generate(plan, promote=promote, context=self.context)
+        formula.expression = expression
+        if self.cache_size > 0:
+            self._functions[expression] = formula
+            if len(self._functions) > self.cache_size:
+                self._functions.popitem(last=False)
+        return formula
+
+    def cache_info(self):
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "evictions": self.cache_evictions,
+            "size": len(self._cache),
+            "functions": len(self._functions),
+            "max_size": self.cache_size,
+        }
+
+    def clear_cache(self):
+        self._cache.clear()
+        self._functions.clear()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+
+    def _compile(self, expression):
+        return self._optimized(self._entry(expression)[0])
+
+    def _entry(self, expression):
+        # Cache entries are [postfix program, optimized plan or None]; the
+        # plan is only built once an expression is used a second time (or
+        # compiled), as the optimizer costs more than one evaluation saves.
+        entry = self._cache.get(expression)
+        if entry is not None:
+            self.cache_hits += 1
+            self._cache.move_to_end(expression)
+            return entry, True
+
+        self.cache_misses += 1
+        if self.context is not None:
+            with localcontext(self.context):
+                entry = [self._to_rpn(tokenize(expression)), None]
+        else:
+            entry = [self._to_rpn(tokenize(expression)), None]
+        if self.cache_size > 0:
+            self._cache[expression] = entry
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.cache_evictions += 1
+        return entry, False
+
+    def _optimized(self, entry):
+        if entry[1] is None:
+            if self.context is not None:
+                with localcontext(self.context):
+                    entry[1] = optimize(entry[0], self.operators, self.unary_operators)
+            else:
+                entry[1] = optimize(entry[0], self.operators, self.unary_operators)
+        return entry[1]
+
+    def _evaluate_entry(self, entry, reused, variables):
+        if reused or entry[1] is not None:
+            return self._evaluate_plan(self._optimized(entry), variables)
+        return self._evaluate_rpn(entry[0], variables)
+
+    def _to_rpn(self, tokens):
+        # Shunting-yard: turn (kind, text) tokens into a postfix tuple of
+        # numbers, variable names and operator symbols, checking operand
+        # counts so evaluation cannot fail on a malformed program.
+        output = []
         operators = []
+        depth = 0
+        expect_operand = True
 
-        for token in tokens:
-            if token in self.operators:
+        for kind, token in tokens:
+            if kind == "number":
+                output.append(int(token) if token.isdigit() else self._number(token))
+                depth += 1
+                expect_operand = False
+            elif kind == "name":
+                output.append(token)
+                depth += 1
+                expect_operand = False
+            elif token == "(":
+                operators.append(token)
+                expect_operand = True
+            elif token == ")":
+                while operators and operators[-1] != "(":
+                    depth = self._emit_operator(operators.pop(), output, depth)
+                if not operators:
+                    raise ValueError("mismatched parentheses")
+                operators.pop()
+                expect_operand = False
+            elif expect_operand:
+                # A sign where an operand belongs is unary; unary plus is a
+                # no-op and unary minus binds tighter than any binary operator.
+                if token == "-":
+                    operators.append("u-")
+                elif token != "+":
+                    raise ValueError(f"unexpected operator: {token}")
+            else:
                 while (
                     operators
-                    and operators[-1] in self.operators
+                    and operators[-1] in self.precedence
                     and self.precedence[operators[-1]] >= self.precedence[token]
                 ):
-                    self._apply_operator(operators, values)
+                    depth = self._emit_operator(operators.pop(), output, depth)
                 operators.append(token)
-            else:
-                try:
-                    values.append(float(token))
-                except ValueError:
-                    raise ValueError(f"invalid token: {token}")
+                expect_operand = True
 
         while operators:
-            self._apply_operator(operators, values)
+            operator = operators.pop()
+            if operator == "(":
+                raise ValueError("mismatched parentheses")
+            depth = self._emit_operator(operator, output, depth)
 
-        if len(values) != 1:
+        if depth != 1:
             raise ValueError("invalid expression")
 
+        return tuple(output)
+
+    def _emit_operator(self, operator, output, depth):
+        if operator in self.unary_operators:
+            if depth < 1:
+                raise ValueError(f"not enough operands for operator {operator}")
+            if not isinstance(output[-1], str):
+                # Negated literal: fold the sign into the constant.
+                output[-1] = self.unary_operators[operator](output[-1])
+            else:
+                output.append(operator)
+            return depth
+        if depth < 2:
+            raise ValueError(f"not enough operands for operator {operator}")
+        output.append(operator)
+        return depth - 1
+
+    def _evaluate_rpn(self, program, variables=None):
+        operators = self.operators
+        unary_operators = self.unary_operators
+        values = []
+        for token in program:
+            if token in operators:
+                b = values.pop()
+                a = values.pop()
+                values.append(operators[token](a, b))
+            elif token in unary_operators:
+                values.append(unary_operators[token](values.pop()))
+            elif isinstance(token, str):
+                values.append(self._lookup(token, variables))
+            else:
+                values.append(token)
         return values[0]
 
-    def _apply_operator(self, operators, values):
-        if not operators:
-            return
+    def _evaluate_plan(self, plan, variables=None):
+        operators = self.operators
+        registers = []
+        for instruction in plan:
+            kind = instruction[0]
+            if kind in operators:
+                registers.append(
+                    operators[kind](registers[instruction[1]], registers[instruction[2]])
+                )
+            elif kind == "const":
+                registers.append(instruction[1])
+            elif kind == "var":
+                registers.append(self._lookup(instruction[1], variables))
+            else:
+                registers.append(self.unary_operators[kind](registers[instruction[1]]))
+        return registers[-1]
+
+    def _lookup(self, name, variables):
+        if variables is None or name not in variables:
+            raise ValueError(f"invalid token: {name}")
+        return variables[name]
+
+    def _batch_length(self, columns):
+        lengths = {len(column) for column in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("columns must all have the same length")
+        return lengths.pop() if lengths else 1
+
+    def _evaluate_batch_numpy(self, numpy, plan, columns, length):
+        operators = self.operators
+        registers = []
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            for instruction in plan:
+                kind = instruction[0]
+                if kind in operators:
+                    a = registers[instruction[1]]
+                    b = registers[instruction[2]]
+                    if kind == "/":
+                        result = numpy.where(b == 0, numpy.nan, numpy.true_divide(a, b))
+                    else:
+                        result = operators[kind](a, b)
+                    registers.append(result)
+                elif kind == "const":
+                    registers.append(numpy.float64(instruction[1]))
+                elif kind == "var":
+                    column = self._lookup(instruction[1], columns)
+                    registers.append(numpy.asarray(column, dtype=numpy.float64))
+                else:
+                    operand = registers[instruction[1]]
+                    registers.append(self.unary_operators[kind](operand))
+        return numpy.broadcast_to(registers[-1], (length,)).copy()
+
+    def _evaluate_batch_python(self, plan, columns, length):
+        operators = self.operators
+        registers = []
+        for instruction in plan:
+            kind = instruction[0]
+            if kind in operators:
+                a = registers[instruction[1]]
+                b = registers[instruction[2]]
+                if not isinstance(a, list) and not isinstance(b, list):
+                    registers.append(self._apply_elementwise(kind, a, b))
+                    continue
+                left = a if isinstance(a, list) else repeat(a, length)
+                right = b if isinstance(b, list) else repeat(b, length)
+                registers.append(
+                    [self._apply_elementwise(kind, x, y) for x, y in zip(left, right)]
+                )
+            elif kind == "const":
+                registers.append(float(instruction[1]))
+            elif kind == "var":
+                registers.append([float(x) for x in self._lookup(instruction[1], columns)])
+            else:
+                operand = registers[instruction[1]]
+                unary = self.unary_operators[kind]
+                if isinstance(operand, list):
+                    registers.append([unary(x) for x in operand])
+                else:
+                    registers.append(unary(operand))
+        result = registers[-1]
+        if not isinstance(result, list):
+            result = [result] * length
+        return array("d", result)
+
+    def _apply_elementwise(self, operator, a, b):
+        if operator == "/":
+            return a / b if b != 0 else float("nan")
+        return self.operators[operator](a, b)
 
-        operator = operators.pop()
-        if len(values) < 2:
-            raise ValueError(f"not enough operands for operator {operator}")
 
-        b = values.pop()
-        a = values.pop()
-        values.append(self.operators[operator](a, b))
+@cache
+def _numpy():
+    # NumPy takes ~80 ms to import, so it is loaded on the first batch
+    # evaluation rather than by every process that evaluates an expression.
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
@@ -0,0 +1,144 @@
+# codegen.py
+
+import ast
+import keyword
+from decimal import localcontext
+
+# The generated function is plain Python arithmetic built from an optimizer
+# plan. Registers read more than once, and nodes nested deeper than
+# _MAX_DEPTH, are spilled into locals so shared work is done once and
+# CPython's compiler never recurses too deeply on long chains.
+
+_MAX_DEPTH = 50
+_PREFIX = "__calc_"
+
+_BINARY_OPERATORS = {
+    "+": ast.Add,
+    "-": ast.Sub,
+    "*": ast.Mult,
+    "/": ast.Div,
+}
+_UNARY_OPERATORS = {
+    "u-": ast.USub,
+}
+
+
+def generate(plan, promote=None, context=None, name="formula"):
+    # promote wraps the left operand of every division (Decimal, Fraction);
+    # context, if given, is entered around the body with localcontext().
+    namespace = {}
+    reads = [0] * len(plan)
+    parameters = []
+    for instruction in plan:
+        if instruction[0] == "var":
+            parameters.append(_parameter(instruction[1]))
+        elif instruction[0] != "const":
+            for operand in instruction[1:]:
+                reads[operand] += 1
+
+    body = []
+    nodes = [None] * len(plan)
+    depths = [0] * len(plan)
+
+    def load(register):
+        node = nodes[register]
+        if isinstance(node, str):
+            return ast.Name(id=node, ctx=ast.Load())
+        if isinstance(node, ast.Constant):
+            return ast.Constant(value=node.value)
+        return node
+
+    for register, instruction in enumerate(plan):
+        kind = instruction[0]
+        if kind == "const":
+            nodes[register] = _constant(instruction[1], namespace, register)
+            continue
+        if kind == "var":
+            nodes[register] = instruction[1]
+            continue
+
+        if kind in _UNARY_OPERATORS:
+            operand = instruction[1]
+            node = ast.UnaryOp(op=_UNARY_OPERATORS[kind](), operand=load(operand))
+            depth = depths[operand] + 1
+        else:
+            left, right = instruction[1], instruction[2]
+            left_node = load(left)
+            if kind == "/" and promote is not None:
+                namespace[_PREFIX + "promote"] = promote
+                left_node = ast.Call(
+                    func=ast.Name(id=_PREFIX + "promote", ctx=ast.Load()),
+                    args=[left_node],
+                    keywords=[],
+                )
+            node = ast.BinOp(
+                left=left_node, op=_BINARY_OPERATORS[kind](), right=load(right)
+            )
+            depth = max(depths[left], depths[right]) + 1
+
+        if register == len(plan) - 1:
+            nodes[register] = node
+        elif reads[register] > 1 or depth >= _MAX_DEPTH:
+            local = f"{_PREFIX}r{register}"
+            body.append(
+                ast.Assign(targets=[ast.Name(id=local, ctx=ast.Store())], value=node)
+            )
+            nodes[register] = local
+            depth = 0
+        else:
+            nodes[register] = node
+        depths[register] = depth
+
+    body.append(ast.Return(value=load(len(plan) - 1)))
+    if context is not None:
+        namespace[_PREFIX + "localcontext"] = localcontext
+        namespace[_PREFIX + "context"] = context
+        body = [
+            ast.With(
+                items=[
+                    ast.withitem(
+                        context_expr=ast.Call(
+                            func=ast.Name(id=_PREFIX + "localcontext", ctx=ast.Load()),
+                            args=[ast.Name(id=_PREFIX + "context", ctx=ast.Load())],
+                            keywords=[],
+                        )
+                    )
+                ],
+                body=body,
+            )
+        ]
+
+    function = ast.FunctionDef(
+        name=name,
+        args=ast.arguments(
+            posonlyargs=[],
+            args=[ast.arg(arg=parameter) for parameter in parameters],
+            kwonlyargs=[],
+            kw_defaults=[],
+            defaults=[],
+        ),
+        body=body,
+        decorator_list=[],
+        type_params=[],
+    )
+    module = ast.fix_missing_locations(ast.Module(body=[function], type_ignores=[]))
+    exec(compile(module, "<calculator>", "exec"), namespace)
+    formula = namespace[name]
+    formula.variables = tuple(parameters)
+    return formula
+
+
+def _parameter(name):
+    if keyword.iskeyword(name) or name.startswith(_PREFIX):
+        raise ValueError(f"cannot compile variable: {name}")
+    return name
+
+
+def _constant(value, namespace, register):
+    if isinstance(value, (int, float)):
+        return ast.Constant(value=value)
+    # Decimal and Fraction constants are not valid AST literals, so they are
+    # bound through the function's globals instead.
+    name = f"{_PREFIX}c{register}"
+    namespace[name] = value
+    return name
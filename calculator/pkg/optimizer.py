@@ -0,0 +1,124 @@
+# optimizer.py
+
+# The optimizer turns a postfix program into a straight-line plan over an
+# expression DAG. Each instruction writes one register and reads registers
+# written before it:
+#
+#     ("const", value)        a literal
+#     ("var", name)           a variable lookup
+#     ("u-", operand)         a unary operator
+#     ("+", left, right)      a binary operator
+#
+# Nodes are hash-consed on (operator, operand registers), so a repeated
+# subexpression is computed once per evaluation. Constant subtrees are
+# folded and additive/multiplicative identities removed while the DAG is
+# built, and instructions the result no longer depends on are dropped.
+
+_LEAVES = ("const", "var")
+_NOT_CONSTANT = object()
+
+
+class _DagBuilder:
+    def __init__(self, operators, unary_operators):
+        self.operators = operators
+        self.unary_operators = unary_operators
+        self.instructions = []
+        self.registers = {}
+
+    def add(self, instruction, key=None):
+        key = instruction if key is None else key
+        register = self.registers.get(key)
+        if register is None:
+            register = len(self.instructions)
+            self.instructions.append(instruction)
+            self.registers[key] = register
+        return register
+
+    def constant(self, value):
+        # Keyed by type as well, so 2 and 2.0 stay distinct constants.
+        return self.add(("const", value), ("const", value.__class__, value))
+
+    def value_of(self, register):
+        instruction = self.instructions[register]
+        if instruction[0] == "const":
+            return instruction[1]
+        return _NOT_CONSTANT
+
+    def unary(self, operator, operand):
+        value = self.value_of(operand)
+        if value is not _NOT_CONSTANT:
+            return self.constant(self.unary_operators[operator](value))
+        instruction = self.instructions[operand]
+        if operator == "u-" and instruction[0] == "u-":
+            return instruction[1]
+        return self.add((operator, operand))
+
+    def binary(self, operator, left, right):
+        a = self.value_of(left)
+        b = self.value_of(right)
+        if a is not _NOT_CONSTANT and b is not _NOT_CONSTANT:
+            try:
+                return self.constant(self.operators[operator](a, b))
+            except ArithmeticError:
+                # Leave e.g. "1 / 0" in place so it fails when evaluated.
+                pass
+
+        # Only exact int identities are removed: "x + 0.0" would change an
+        # int result into a float.
+        if operator in ("+", "-") and _is_int(b, 0):
+            return left
+        if operator == "+" and _is_int(a, 0):
+            return right
+        if operator == "*" and _is_int(b, 1):
+            return left
+        if operator == "*" and _is_int(a, 1):
+            return right
+
+        if operator in ("+", "*") and left > right:
+            left, right = right, left
+        return self.add((operator, left, right))
+
+    def plan(self, root):
+        instructions = self.instructions
+        live = [False] * (root + 1)
+        live[root] = True
+        for register in range(root, -1, -1):
+            instruction = instructions[register]
+            if live[register] and instruction[0] not in _LEAVES:
+                for operand in instruction[1:]:
+                    live[operand] = True
+
+        renumbered = {}
+        plan = []
+        for register in range(root + 1):
+            if not live[register]:
+                continue
+            instruction = instructions[register]
+            if instruction[0] not in _LEAVES:
+                instruction = (instruction[0],) + tuple(
+                    renumbered[operand] for operand in instruction[1:]
+                )
+            renumbered[register] = len(plan)
+            plan.append(instruction)
+        return tuple(plan)
+
+
+def _is_int(value, target):
+    return value.__class__ is int and value == target
+
+
+def optimize(program, operators, unary_operators):
+    builder = _DagBuilder(operators, unary_operators)
+    stack = []
+    for token in program:
+        if token in operators:
+            right = stack.pop()
+            left = stack.pop()
+            stack.append(builder.binary(token, left, right))
+        elif token in unary_operators:
+            stack.append(builder.unary(token, stack.pop()))
+        elif isinstance(token, str):
+            stack.append(builder.add(("var", token)))
+        else:
+            stack.append(builder.constant(token))
+    return builder.plan(stack[-1])
@@ -0,0 +1,109 @@
+# parallel.py
+
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .calculator import Calculator
+from .stream import evaluate_line
+
+# Each worker process keeps one warm Calculator (and its compile cache) for
+# every chunk it is handed.
+_worker_calculator = None
+
+
+def _init_worker(cache_size):
+    global _worker_calculator
+    _worker_calculator = Calculator(cache_size=cache_size)
+
+
+def _evaluate_chunk(path, start, end, output_format):
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode()
+
+    lines = text.split("\n")
+    if text.endswith("\n"):
+        lines.pop()
+    results = [evaluate_line(_worker_calculator, line, output_format) for line in lines]
+    output = "\n".join(results) + "\n" if results else ""
+    return os.getpid(), len(lines), time.perf_counter() - started, output
+
+
+def chunk_offsets(path, chunk_size):
+    # Split the file into byte ranges of roughly chunk_size bytes, each ending
+    # on a newline so no expression is cut in half.
+    size = os.path.getsize(path)
+    offsets = [0]
+    with open(path, "rb") as f:
+        while offsets[-1] < size:
+            f.seek(offsets[-1] + chunk_size)
+            f.readline()
+            offsets.append(min(f.tell(), size))
+    return list(zip(offsets, offsets[1:]))
+
+
+def evaluate_file(
+    path,
+    out,
+    workers=None,
+    chunk_size=1 << 20,
+    output_format="plain",
+    cache_size=256,
+):
+    # Evaluate every line of path across a process pool and write results to
+    # out in input order. Only a bounded window of chunks is in flight, so
+    # memory stays flat regardless of file size.
+    workers = workers or os.cpu_count() or 1
+    stats = {}
+    total_lines = 0
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(cache_size,)
+    ) as executor:
+        pending = deque()
+
+        def drain_one():
+            nonlocal total_lines
+            pid, lines, seconds, output = pending.popleft().result()
+            out.write(output)
+            worker = stats.setdefault(pid, {"chunks": 0, "lines": 0, "seconds": 0.0})
+            worker["chunks"] += 1
+            worker["lines"] += lines
+            worker["seconds"] += seconds
+            total_lines += lines
+
+        for start, end in chunk_offsets(path, chunk_size):
+            pending.append(
+                executor.submit(_evaluate_chunk, path, start, end, output_format)
+            )
+            if len(pending) >= workers * 2:
+                drain_one()
+        while pending:
+            drain_one()
+
+    out.flush()
+    for worker in stats.values():
+        seconds = worker["seconds"]
+        worker["lines_per_second"] = worker["lines"] / seconds if seconds else 0.0
+    return {
+        "lines": total_lines,
+        "seconds": time.perf_counter() - started,
+        "workers": stats,
+    }
+
+
+def print_report(report, file=sys.stderr):
+    seconds = report["seconds"]
+    rate = report["lines"] / seconds if seconds else 0.0
+    print(f"{report['lines']} lines in {seconds:.2f}s ({rate:,.0f} lines/s)", file=file)
+    for pid, worker in sorted(report["workers"].items()):
+        print(
+            f"  worker {pid}: {worker['chunks']} chunks, {worker['lines']} lines, "
+            f"{worker['lines_per_second']:,.0f} lines/s",
+            file=file,
+        )
@@ -1,23 +1,58 @@
 # render.py
 
-def render(expression, result):
+import io
+
+
+def format_result(result):
     if isinstance(result, float) and result.is_integer():
-        result_str = str(int(result))
-    else:
-        result_str = str(result)
+        return str(int(result))
+    return str(result)
 
-    box_width = max(len(expression), len(result_str)) + 4
 
-    box = []
-    box.append("┌" + "─" * box_width + "┐")
-    box.append(
-        "│" + " " * 2 + expression + " " * (box_width - len(expression) - 2) + "│"
-    )
-    box.append("│" + " " * box_width + "│")
-    box.append("│" + " " * 2 + "=" + " " * (box_width - 3) + "│")
-    box.append("│" + " " * box_width + "│")
-    box.append(
-        "│" + " " * 2 + result_str + " " * (box_width - len(result_str) - 2) + "│"
+def render(expression, result, compact=False):
+    result_str = format_result(result)
+    if compact:
+        return f"{expression}\t{result_str}"
+
+    box_width = max(len(expression), len(result_str)) + 4
+    border = "─" * box_width
+    blank = "│" + " " * box_width + "│"
+    return "\n".join(
+        (
+            "┌" + border + "┐",
+            "│  " + expression.ljust(box_width - 2) + "│",
+            blank,
+            "│  " + "=".ljust(box_width - 2) + "│",
+            blank,
+            "│  " + result_str.ljust(box_width - 2) + "│",
+            "└" + border + "┘",
+        )
     )
-    box.append("└" + "─" * box_width + "┘")
-    return "\n".join(box)
+
+
+def render_many(pairs, compact=False):
+    # Render many (expression, result) pairs in one pass. Boxes share a
+    # single width, so the border, blank and "=" lines are built once and
+    # every box is written straight into one buffer.
+    rows = [(expression, format_result(result)) for expression, result in pairs]
+    out = io.StringIO()
+    if compact:
+        for expression, result_str in rows:
+            out.write(f"{expression}\t{result_str}\n")
+        return out.getvalue()[:-1]
+    if not rows:
+        return ""
+
+    box_width = max(max(len(e), len(r)) for e, r in rows) + 4
+    inner = box_width - 2
+    top = "┌" + "─" * box_width + "┐\n"
+    middle = "│" + " " * box_width + "│\n│  " + "=".ljust(inner) + "│\n"
+    middle += "│" + " " * box_width + "│\n"
+    bottom = "└" + "─" * box_width + "┘\n"
+    for expression, result_str in rows:
+        out.write(top)
+        out.write("│  " + expression.ljust(inner) + "│\n")
+        out.write(middle)
+        out.write("│  " + result_str.ljust(inner) + "│\n")
+        out.write(bottom)
+    return out.getvalue()[:-1]
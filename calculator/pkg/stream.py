@@ -0,0 +1,48 @@
+# stream.py
+
+import json
+import math
+
+from .render import format_result
+
+
+def evaluate_line(calculator, line, output_format="plain"):
+    expression = line.rstrip("\n")
+    try:
+        result = calculator.evaluate(expression)
+    except Exception as e:
+        if output_format == "jsonl":
+            return json.dumps({"error": str(e)})
+        return f"Error: {e}"
+
+    if output_format == "jsonl":
+        if isinstance(result, float) and result.is_integer():
+            result = int(result)
+        elif isinstance(result, float) and not math.isfinite(result):
+            # JSON has no infinity or NaN; "inf", "-inf" and "nan" are
+            # what float() reads back.
+            result = str(result)
+        elif result is not None and not isinstance(result, (int, float)):
+            # Decimal and Fraction results keep their exact text form.
+            result = str(result)
+        return json.dumps({"result": result}, allow_nan=False)
+    return format_result(result) if result is not None else ""
+
+
+def evaluate_stream(calculator, lines, out, output_format="plain", block_size=4096):
+    # Evaluate newline-delimited expressions with one shared calculator,
+    # writing one output line per input line. Results are joined and written
+    # in blocks of block_size lines rather than one write per result.
+    block = []
+    count = 0
+    for line in lines:
+        block.append(evaluate_line(calculator, line, output_format))
+        if len(block) >= block_size:
+            out.write("\n".join(block) + "\n")
+            count += len(block)
+            block = []
+    if block:
+        out.write("\n".join(block) + "\n")
+        count += len(block)
+    out.flush()
+    return count
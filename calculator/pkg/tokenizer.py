@@ -0,0 +1,27 @@
+# tokenizer.py
+
+import re
+
+_TOKEN = re.compile(
+    r"""
+    \s*(?:
+        (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+      | (?P<name>[A-Za-z_]\w*)
+      | (?P<operator>[-+*/])
+      | (?P<paren>[()])
+      | (?P<error>\S)
+    )
+    """,
+    re.VERBOSE,
+)
+
+
+def tokenize(expression):
+    # Single pass over the characters of the expression, yielding
+    # (kind, text) pairs as they are found. Whitespace between tokens is
+    # optional; "3+5" and "3 + 5" produce the same tokens.
+    for match in _TOKEN.finditer(expression):
+        kind = match.lastgroup
+        if kind == "error":
+            raise ValueError(f"invalid token: {match.group(kind)}")
+        yield kind, match.group(kind)
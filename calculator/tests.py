@@ -1,5 +1,22 @@
 
+import io
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
 import unittest
+from array import array
+from decimal import Decimal
+from fractions import Fraction
+
+from pkg.calculator import Calculator as PkgCalculator
+from pkg.optimizer import optimize
+from pkg.parallel import evaluate_file
+from pkg.render import render, render_many
+from pkg.stream import evaluate_stream
+from pkg.tokenizer import tokenize
 
 class Calculator:
     def add(self, a, b):
@@ -55,5 +72,266 @@ class TestCalculator(unittest.TestCase):
     def test_divide_negative_numbers(self):
         self.assertEqual(self.calculator.divide(-6, -2), 3)
 
+class TestCalculatorCache(unittest.TestCase):
+
+    def setUp(self):
+        self.calculator = PkgCalculator(cache_size=2)
+
+    def test_repeated_expression_hits_cache(self):
+        self.assertEqual(self.calculator.evaluate("3 + 5 * 2"), 13)
+        self.assertEqual(self.calculator.evaluate("3 + 5 * 2"), 13)
+        info = self.calculator.cache_info()
+        self.assertEqual(info["hits"], 1)
+        self.assertEqual(info["misses"], 1)
+
+    def test_least_recently_used_is_evicted(self):
+        self.calculator.evaluate("1 + 1")
+        self.calculator.evaluate("2 + 2")
+        self.calculator.evaluate("1 + 1")
+        self.calculator.evaluate("3 + 3")
+        self.assertEqual(self.calculator.cache_info()["evictions"], 1)
+        self.calculator.evaluate("1 + 1")
+        self.assertEqual(self.calculator.cache_info()["hits"], 2)
+
+    def test_plan_is_optimized_only_on_reuse(self):
+        expression = "(x + 1) * (x + 1) - 0"
+        self.assertEqual(self.calculator.evaluate(expression, {"x": 2}), 9)
+        self.assertIsNone(self.calculator._cache[expression][1])
+        self.assertEqual(self.calculator.evaluate(expression, {"x": 3}), 16)
+        self.assertEqual(len(self.calculator._cache[expression][1]), 4)
+
+    def test_invalid_expression_is_not_cached(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("3 +")
+        self.assertEqual(self.calculator.cache_info()["size"], 0)
+
+class TestCalculatorBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.calculator = PkgCalculator()
+
+    def test_variables_bind_in_evaluate(self):
+        self.assertEqual(self.calculator.evaluate("x * 2 + y", {"x": 3, "y": 1}), 7)
+
+    def test_unbound_variable_is_invalid_token(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("x + 1")
+
+    def test_batch_over_array_columns(self):
+        columns = {"x": array("d", [1, 2, 3]), "y": [4, 5, 6]}
+        result = self.calculator.evaluate_batch("x + y * 2", columns)
+        self.assertEqual(list(result), [9, 12, 15])
+
+    def test_batch_divide_by_zero_is_nan(self):
+        result = self.calculator.evaluate_batch("x / y", {"x": [1, 2], "y": [0, 4]})
+        self.assertTrue(math.isnan(result[0]))
+        self.assertEqual(result[1], 0.5)
+
+    def test_batch_constant_expression_is_broadcast(self):
+        result = self.calculator.evaluate_batch("1 / 0", {"x": [1, 2]})
+        self.assertEqual(len(result), 2)
+        self.assertTrue(all(math.isnan(value) for value in result))
+
+    def test_batch_without_numpy_matches(self):
+        plan = self.calculator._compile("x / y - 1")
+        columns = {"x": [1, 2, 3], "y": [0, 4, 2]}
+        result = self.calculator._evaluate_batch_python(plan, columns, 3)
+        self.assertIsInstance(result, array)
+        self.assertTrue(math.isnan(result[0]))
+        self.assertEqual(list(result[1:]), [-0.5, 0.5])
+
+    def test_import_does_not_load_numpy(self):
+        loaded = subprocess.run(
+            [sys.executable, "-c", "import sys, pkg.calculator; print('numpy' in sys.modules)"],
+            capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(loaded.stdout.strip(), "False")
+
+class TestTokenizer(unittest.TestCase):
+
+    def setUp(self):
+        self.calculator = PkgCalculator()
+
+    def test_tokens_without_whitespace(self):
+        self.assertEqual(
+            list(tokenize("3+5*x")),
+            [("number", "3"), ("operator", "+"), ("number", "5"),
+             ("operator", "*"), ("name", "x")],
+        )
+
+    def test_scientific_notation(self):
+        self.assertEqual(self.calculator.evaluate("1e3 / 2.5E-1"), 4000)
+
+    def test_parentheses_and_unary_minus(self):
+        self.assertEqual(self.calculator.evaluate("-(2+3)*-2"), 10)
+        self.assertEqual(self.calculator.evaluate("2 * (3 + 4)"), 14)
+
+    def test_mismatched_parentheses(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("(1 + 2")
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("1 + 2)")
+
+    def test_invalid_character(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("3 $ 4")
+
+    def test_invalid_operator_position(self):
+        for expression in ["3 * * 4", "* 3", "/ 5", "3 + / 2"]:
+            with self.assertRaises(ValueError):
+                self.calculator.evaluate(expression)
+        self.assertEqual(self.calculator.evaluate("+3 * -2"), -6)
+
+class TestEvaluateStream(unittest.TestCase):
+
+    def test_plain_output_one_line_per_expression(self):
+        out = io.StringIO()
+        count = evaluate_stream(PkgCalculator(), ["3+5\n", "1/0\n", "7/2\n"], out, block_size=2)
+        self.assertEqual(count, 3)
+        self.assertEqual(out.getvalue(), "8\nError: division by zero\n3.5\n")
+
+    def test_jsonl_output(self):
+        out = io.StringIO()
+        evaluate_stream(PkgCalculator(), ["2 * 4\n", "3 $\n"], out, output_format="jsonl")
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(lines, [{"result": 8}, {"error": "invalid token: $"}])
+
+    def test_jsonl_non_finite_results_are_strings(self):
+        out = io.StringIO()
+        evaluate_stream(PkgCalculator(), ["1e308*10\n", "-1e308*10\n", "1e308*10 - 1e308*10\n"], out, output_format="jsonl")
+        lines = [json.loads(line, parse_constant=self.fail) for line in out.getvalue().splitlines()]
+        self.assertEqual(lines, [{"result": "inf"}, {"result": "-inf"}, {"result": "nan"}])
+
+class TestParallelEvaluateFile(unittest.TestCase):
+
+    def test_results_keep_input_order(self):
+        expressions = [f"{i} * 2 + 1" for i in range(500)] + ["1 / 0"]
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            f.write("\n".join(expressions) + "\n")
+        self.addCleanup(os.remove, f.name)
+
+        out = io.StringIO()
+        report = evaluate_file(f.name, out, workers=2, chunk_size=256)
+        expected = [str(i * 2 + 1) for i in range(500)] + ["Error: division by zero"]
+        self.assertEqual(out.getvalue().splitlines(), expected)
+        self.assertEqual(report["lines"], 501)
+
+class TestNumericBackends(unittest.TestCase):
+
+    def test_integer_only_expression_stays_int(self):
+        result = PkgCalculator().evaluate("2 * 3 + 4")
+        self.assertIsInstance(result, int)
+        self.assertEqual(result, 10)
+
+    def test_division_promotes_to_float(self):
+        self.assertEqual(PkgCalculator().evaluate("7 / 2"), 3.5)
+
+    def test_decimal_backend_is_exact(self):
+        calculator = PkgCalculator(backend="decimal", precision=10)
+        self.assertEqual(calculator.evaluate("0.1 + 0.2"), Decimal("0.3"))
+        self.assertEqual(calculator.evaluate("1 / 3"), Decimal("0.3333333333"))
+
+    def test_fraction_backend(self):
+        calculator = PkgCalculator(backend="fraction")
+        self.assertEqual(calculator.evaluate("1 / 3 + 1 / 6"), Fraction(1, 2))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            PkgCalculator(backend="complex")
+
+class TestOptimizer(unittest.TestCase):
+
+    def setUp(self):
+        self.calculator = PkgCalculator()
+
+    def plan(self, expression):
+        program = self.calculator._to_rpn(tokenize(expression))
+        return optimize(program, self.calculator.operators, self.calculator.unary_operators)
+
+    def test_constant_subtrees_are_folded(self):
+        self.assertEqual(self.plan("2 * (3 + 4) - 1"), (("const", 13),))
+
+    def test_common_subexpressions_are_shared(self):
+        plan = self.plan("(x + y) * (y + x)")
+        self.assertEqual(plan, (("var", "x"), ("var", "y"), ("+", 0, 1), ("*", 2, 2)))
+
+    def test_identities_are_removed(self):
+        self.assertEqual(self.plan("x * 1 + 0 - --y * (2 - 1)"),
+                         (("var", "x"), ("var", "y"), ("-", 0, 1)))
+
+    def test_float_identity_is_kept(self):
+        self.assertEqual(len(self.plan("x + 0.0")), 3)
+
+    def test_division_by_zero_is_not_folded(self):
+        with self.assertRaises(ZeroDivisionError):
+            self.calculator.evaluate("x + 1 / 0", {"x": 1})
+
+    def test_optimized_evaluation_over_bindings(self):
+        for x in range(5):
+            self.assertEqual(self.calculator.evaluate("(x + 1) * (x + 1) * 1", {"x": x}), (x + 1) ** 2)
+
+class TestCompile(unittest.TestCase):
+
+    def setUp(self):
+        self.calculator = PkgCalculator()
+
+    def test_compiled_function_matches_evaluate(self):
+        expression = "(x + y) * (x + y) - z / 2 + 3 * 4"
+        formula = self.calculator.compile(expression)
+        self.assertEqual(formula.variables, ("x", "y", "z"))
+        bindings = {"x": 1, "y": 2, "z": 3}
+        self.assertEqual(formula(**bindings), self.calculator.evaluate(expression, bindings))
+
+    def test_compiled_functions_are_cached(self):
+        self.assertIs(self.calculator.compile("x + 1"), self.calculator.compile("x + 1"))
+
+    def test_long_chain_compiles(self):
+        expression = " + ".join(f"x * {i}" for i in range(5000))
+        self.assertEqual(self.calculator.compile(expression)(2), 2 * sum(range(5000)))
+
+    def test_decimal_backend_compiles_with_context(self):
+        formula = PkgCalculator(backend="decimal", precision=5).compile("x / 3")
+        self.assertEqual(formula(1), Decimal("0.33333"))
+
+    def test_keyword_variable_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.calculator.compile("lambda + 1")
+
+class TestRender(unittest.TestCase):
+
+    def test_render_many_shares_one_width(self):
+        output = render_many([("3 + 5", 8.0), ("10 / 4", 2.5)])
+        lines = output.splitlines()
+        self.assertEqual(len(lines), 14)
+        self.assertEqual(len({len(line) for line in lines}), 1)
+        self.assertEqual(lines[5], "│  8       │")
+
+    def test_single_box_matches_render(self):
+        self.assertEqual(render_many([("3 + 5", 8.0)]), render("3 + 5", 8.0))
+
+    def test_compact_mode(self):
+        self.assertEqual(render("7 / 2", 3.5, compact=True), "7 / 2\t3.5")
+        self.assertEqual(render_many([("1+1", 2.0), ("7/2", 3.5)], compact=True), "1+1\t2\n7/2\t3.5")
+
+class TestCommandLine(unittest.TestCase):
+
+    def run_main(self, *args):
+        return subprocess.run(
+            [sys.executable, "main.py", *args], capture_output=True, text=True, check=True
+        ).stdout
+
+    def test_bad_file_options_print_usage(self):
+        for args in (["--file"], ["--file", "x.txt", "--workers", "two"], ["--file", "x.txt", "--chunk-size", "0"]):
+            output = self.run_main(*args)
+            self.assertTrue(output.startswith("Error: --file needs a path"), args)
+            self.assertIn("Usage:", output)
+
+    def test_single_expression_skips_process_pool(self):
+        loaded = subprocess.run(
+            [sys.executable, "-c", "import sys, main; print('multiprocessing' in sys.modules)"],
+            capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(loaded.stdout.strip(), "False")
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
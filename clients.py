@@ -0,0 +1,180 @@
+import json
+import os
+import threading
+
+# Selects the model backend: "gemini" (default), "replay:<fixture.json>" or
+# "record:<fixture.json>"
+CLIENT_ENV_VAR = "AGENT_CLIENT"
+
+
+def make_client(spec=None, api_key=None):
+    """
+    Builds the client the agent loop talks to.
+
+    Every backend exposes the two calls the loop makes, client.models.generate_content
+    and client.aio.models.generate_content_stream, so the loop does not care which
+    one it gets.
+
+    Args:
+        spec (str): "gemini", "replay:<path>" or "record:<path>". Defaults to the
+            AGENT_CLIENT environment variable, then "gemini".
+        api_key (str): API key for the live backends.
+
+    Returns:
+        The client object.
+    """
+    spec = spec or os.environ.get(CLIENT_ENV_VAR) or "gemini"
+    kind, _, path = spec.partition(":")
+    if kind in ("gemini", "record"):
+        from google import genai
+    if kind == "gemini":
+        return genai.Client(api_key=api_key)
+    if kind == "replay":
+        return ReplayClient(path)
+    if kind == "record":
+        return RecordingClient(genai.Client(api_key=api_key), path)
+    raise ValueError(f"unknown client: {spec}")
+
+
+class ReplayClient:
+    """
+    Offline stand-in for genai.Client that serves recorded responses in order.
+
+    A fixture is a JSON object with the session's "prompt" and a "turns" list holding
+    one entry per model call; each entry is the list of GenerateContentResponse
+    chunks for that call, as dumped by RecordingClient (or written by hand).
+    Synchronous calls get the chunks merged into one response; streaming calls get
+    them one by one. Requests are not inspected, so a session replays identically
+    on every run.
+
+    Args:
+        path (str): The fixture file.
+    """
+
+    def __init__(self, path):
+        from google.genai import types
+
+        with open(path, "r") as f:
+            fixture = json.load(f)
+        self.turns = [
+            [types.GenerateContentResponse.model_validate(chunk) for chunk in turn]
+            for turn in fixture["turns"]
+        ]
+        self.position = 0
+        self.lock = threading.Lock()
+        self.models = _ReplayModels(self)
+        self.aio = _Namespace(models=_AsyncReplayModels(self))
+
+    def next_turn(self):
+        with self.lock:
+            if self.position >= len(self.turns):
+                raise RuntimeError(f"replay fixture exhausted after {len(self.turns)} model calls")
+            turn = self.turns[self.position]
+            self.position += 1
+            return turn
+
+
+class RecordingClient:
+    """
+    Wraps a live client and saves every response it returns as a replay fixture.
+
+    The fixture is rewritten after each call, so an interrupted session still leaves
+    a usable file.
+
+    Args:
+        client (genai.Client): The live client.
+        path (str): The fixture file to write.
+    """
+
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+        self.prompt = None
+        self.turns = []
+        self.models = _RecordingModels(self)
+        self.aio = _Namespace(models=_AsyncRecordingModels(self))
+
+    def save_turn(self, contents, chunks):
+        # The first user message is kept so the session can be re-run as recorded
+        if self.prompt is None and contents and contents[0].parts:
+            self.prompt = contents[0].parts[0].text
+        self.turns.append([chunk.model_dump(mode="json", exclude_none=True) for chunk in chunks])
+        with open(self.path, "w") as f:
+            json.dump({"prompt": self.prompt, "turns": self.turns}, f, indent=1)
+
+
+class _Namespace:
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+class _ReplayModels:
+    def __init__(self, replay):
+        self.replay = replay
+
+    def generate_content(self, model, contents, config=None):
+        return merge_chunks(self.replay.next_turn())
+
+
+class _AsyncReplayModels:
+    def __init__(self, replay):
+        self.replay = replay
+
+    async def generate_content_stream(self, model, contents, config=None):
+        turn = self.replay.next_turn()
+
+        async def chunks():
+            for chunk in turn:
+                yield chunk
+
+        return chunks()
+
+
+class _RecordingModels:
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def generate_content(self, model, contents, config=None):
+        response = self.recorder.client.models.generate_content(
+            model=model, contents=contents, config=config
+        )
+        self.recorder.save_turn(contents, [response])
+        return response
+
+
+class _AsyncRecordingModels:
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    async def generate_content_stream(self, model, contents, config=None):
+        stream = await self.recorder.client.aio.models.generate_content_stream(
+            model=model, contents=contents, config=config
+        )
+
+        async def chunks():
+            recorded = []
+            async for chunk in stream:
+                recorded.append(chunk)
+                yield chunk
+            self.recorder.save_turn(contents, recorded)
+
+        return chunks()
+
+
+def merge_chunks(chunks):
+    # One response with every chunk's parts and the last usage_metadata
+    from google.genai import types
+
+    if len(chunks) == 1:
+        return chunks[0]
+    parts = []
+    usage_metadata = None
+    for chunk in chunks:
+        if chunk.usage_metadata:
+            usage_metadata = chunk.usage_metadata
+        if chunk.candidates and chunk.candidates[0].content:
+            parts.extend(chunk.candidates[0].content.parts or [])
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=parts))],
+        usage_metadata=usage_metadata,
+    )
@@ -0,0 +1,227 @@
+import argparse
+import contextvars
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+
+# Where the daemon listens unless --socket says otherwise
+DEFAULT_SOCKET = os.path.join(os.environ.get("XDG_RUNTIME_DIR", "/tmp"), f"bootsai-{os.getuid()}.sock")
+
+# Prompts served at the same time; further requests wait for a free slot
+DEFAULT_MAX_SESSIONS = 8
+
+# The output stream of the session running in the current context, if any
+session_output = contextvars.ContextVar("session_output", default=None)
+
+
+class _SessionStdout:
+    """
+    Stand-in for sys.stdout that sends each write to the session whose context it
+    comes from. Sessions print from their own thread and from tool worker threads
+    (which run in a copy of the session's context), so the agent loop's print calls
+    reach the right client unchanged. Writes outside any session go to the real
+    stdout.
+    """
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+
+    def write(self, text):
+        output = session_output.get()
+        if output is None:
+            return self.stdout.write(text)
+        output.write(text)
+        return len(text)
+
+    def flush(self):
+        output = session_output.get()
+        (self.stdout if output is None else output).flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stdout, name)
+
+
+class _SocketOutput:
+    # Sends text to the client as {"output": ...} lines; one lock per session,
+    # since its tool threads print concurrently
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        self.send({"output": text})
+
+    def send(self, message):
+        with self.lock:
+            self.wfile.write((json.dumps(message) + "\n").encode())
+            self.wfile.flush()
+
+    def flush(self):
+        pass
+
+
+class _SessionHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        import main as agent
+        from google.genai import types
+        from tracing import DEFAULT_TRACE_FILE, Tracer
+
+        output = _SocketOutput(self.wfile)
+        try:
+            request = json.loads(self.rfile.readline())
+            prompt = request["prompt"]
+            working_directory = request.get("working_directory", agent.DEFAULT_WORKING_DIRECTORY)
+            if not os.path.isdir(working_directory):
+                raise ValueError(f"working directory not found: {working_directory}")
+        except (ValueError, KeyError, TypeError) as e:
+            output.send({"error": f"bad request: {e}", "done": True})
+            return
+
+        tracer = None
+        if request.get("trace"):
+            tracer = Tracer(os.environ.get("AGENT_TRACE_FILE", DEFAULT_TRACE_FILE))
+
+        with self.server.sessions:
+            # Every session has its own history; the client and tool state are shared
+            messages = [types.Content(role="user", parts=[types.Part(text=prompt)])]
+            session_output.set(output)
+            try:
+                agent.run_agent(
+                    messages,
+                    prompt,
+                    verbose=bool(request.get("verbose")),
+                    tracer=tracer,
+                    working_directory=working_directory,
+                )
+            except Exception as e:
+                output.send({"error": f"session failed: {e}", "done": True})
+                return
+            finally:
+                session_output.set(None)
+        output.send({"done": True})
+
+
+class AgentDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves agent sessions over a Unix socket from one warm process.
+
+    The SDK, the client (and its HTTP connection pool) and the tool declarations are
+    set up once at start, so a prompt costs only its model round trips. Each
+    connection carries one JSON request line ({"prompt", "working_directory",
+    "verbose", "trace"}) and gets back JSON lines of output, ending with one that has
+    "done" set. Sessions run on their own threads, each with its own message history
+    and working directory; at most max_sessions run at once.
+
+    Args:
+        path (str): Socket path. A stale socket file left by a previous run is removed.
+        max_sessions (int): Number of sessions served concurrently.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path=DEFAULT_SOCKET, max_sessions=DEFAULT_MAX_SESSIONS):
+        import main as agent
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        agent.get_client()
+        agent.get_available_functions()
+
+        if os.path.exists(path):
+            os.unlink(path)
+        self.sessions = threading.BoundedSemaphore(max_sessions)
+        # Only the owner may connect: sessions can run code in any directory. The
+        # umask applies as bind() creates the socket, so it is never open to others.
+        mask = os.umask(0o077)
+        try:
+            super().__init__(path, _SessionHandler)
+        finally:
+            os.umask(mask)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def serve(path=DEFAULT_SOCKET, max_sessions=DEFAULT_MAX_SESSIONS, warm_pool=False):
+    if warm_pool:
+        from functions.get_files_info import enable_python_pool
+
+        enable_python_pool()
+
+    sys.stdout = _SessionStdout(sys.stdout)
+    # Exit through the with block below, so the socket file is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    with AgentDaemon(path, max_sessions) as server:
+        print(f"Agent daemon listening on {path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def ask(prompt, path=DEFAULT_SOCKET, working_directory=None, verbose=False, trace=False):
+    """
+    Sends one prompt to a running daemon and prints its output as it arrives.
+
+    Returns:
+        int: 0 if the session finished, 1 otherwise.
+    """
+    request = {"prompt": prompt, "verbose": verbose, "trace": trace}
+    if working_directory:
+        # Resolved here, since the daemon's current directory may differ
+        request["working_directory"] = os.path.abspath(working_directory)
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(path)
+        except OSError as e:
+            print(f"Cannot reach the agent daemon at {path}: {e}", file=sys.stderr)
+            print("Start it with: python daemon.py serve", file=sys.stderr)
+            return 1
+        client.sendall((json.dumps(request) + "\n").encode())
+
+        with client.makefile("r") as responses:
+            for line in responses:
+                message = json.loads(line)
+                if "output" in message:
+                    sys.stdout.write(message["output"])
+                    sys.stdout.flush()
+                if "error" in message:
+                    print(message["error"], file=sys.stderr)
+                    return 1
+                if message.get("done"):
+                    return 0
+    print("The agent daemon closed the connection early", file=sys.stderr)
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the agent as a daemon, or send it a prompt")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subcommands.add_parser("serve", help="start the daemon")
+    serve_parser.add_argument("--max-sessions", type=int, default=DEFAULT_MAX_SESSIONS)
+    serve_parser.add_argument("--warm-pool", action="store_true", help="run scripts in warm interpreters")
+
+    ask_parser = subcommands.add_parser("ask", help="send a prompt to the daemon")
+    ask_parser.add_argument("prompt", nargs="+")
+    ask_parser.add_argument("--working-directory", "-C", help="directory the tools are confined to")
+    ask_parser.add_argument("--verbose", action="store_true")
+    ask_parser.add_argument("--trace", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args.socket, args.max_sessions, args.warm_pool)
+    else:
+        sys.exit(ask(" ".join(args.prompt), args.socket, args.working_directory, args.verbose, args.trace))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import ast
+import os
+import re
+import threading
+
+try:
+    # Private to re, so they may move; without them regex searches simply scan
+    # every file instead of filtering by trigrams
+    from re import _constants as sre_constants
+    from re import _parser as sre_parser
+except ImportError:
+    sre_constants = sre_parser = None
+
+# Files larger than this are not indexed
+MAX_INDEXED_BYTES = 1_000_000
+
+# Directory names never descended into
+SKIPPED_DIRECTORIES = {".git", "__pycache__", ".venv", "venv", "node_modules", ".mypy_cache", ".pytest_cache"}
+
+
+class CodeIndex:
+    """
+    Incrementally updated search index over the text files under one directory.
+
+    Every file keeps its lines, the set of lowercase trigrams in its content, and (for
+    Python files) a symbol table built with the ast module. A trigram posting map from
+    each trigram to the files containing it lets regex searches skip every file that
+    cannot contain the pattern's literal text. refresh() re-stats the tree and only
+    re-reads files whose mtime or size changed, so repeated queries are cheap.
+
+    Args:
+        root (str): Absolute path of the directory to index.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.files = {}
+        self.postings = {}
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        seen = set()
+        for relative_path, stat_result in self._walk():
+            seen.add(relative_path)
+            current = self.files.get(relative_path)
+            if current and current["stamp"] == (stat_result.st_mtime_ns, stat_result.st_size):
+                continue
+            self._remove(relative_path)
+            self._add(relative_path, stat_result)
+
+        for relative_path in list(self.files):
+            if relative_path not in seen:
+                self._remove(relative_path)
+
+    def search(self, pattern, ignore_case=False, max_results=50):
+        regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        matches = []
+        total = 0
+        for relative_path in sorted(self._candidates(pattern)):
+            for line_number, line in enumerate(self.files[relative_path]["lines"], start=1):
+                if regex.search(line):
+                    total += 1
+                    if len(matches) < max_results:
+                        matches.append((relative_path, line_number, line))
+        return matches, total
+
+    def find_symbols(self, name, max_results=50):
+        # Exact (case-insensitive) name matches sort before substring matches
+        wanted = name.lower()
+        results = []
+        for relative_path, entry in self.files.items():
+            for symbol, kind, line_number in entry["symbols"]:
+                short_name = symbol.rsplit(".", 1)[-1].lower()
+                if wanted in symbol.lower():
+                    rank = 0 if short_name == wanted else 1
+                    results.append((rank, relative_path, line_number, kind, symbol))
+        results.sort()
+        return [result[1:] for result in results[:max_results]], len(results)
+
+    def _walk(self):
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as scanner:
+                    entries = list(scanner)
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIPPED_DIRECTORIES:
+                        stack.append(entry.path)
+                elif entry.is_file():
+                    stat_result = entry.stat()
+                    if stat_result.st_size <= MAX_INDEXED_BYTES:
+                        yield os.path.relpath(entry.path, self.root), stat_result
+
+    def _add(self, relative_path, stat_result):
+        try:
+            with open(os.path.join(self.root, relative_path), "rb") as f:
+                data = f.read()
+        except OSError:
+            return
+        if b"\0" in data[:8192]:
+            return
+
+        text = data.decode("utf-8", errors="replace")
+        lowered = text.lower()
+        trigrams = {lowered[i:i + 3] for i in range(len(lowered) - 2)}
+        for trigram in trigrams:
+            self.postings.setdefault(trigram, set()).add(relative_path)
+
+        self.files[relative_path] = {
+            "stamp": (stat_result.st_mtime_ns, stat_result.st_size),
+            "lines": text.split("\n"),
+            "trigrams": trigrams,
+            "symbols": _python_symbols(text) if relative_path.endswith(".py") else [],
+        }
+
+    def _remove(self, relative_path):
+        entry = self.files.pop(relative_path, None)
+        if not entry:
+            return
+        for trigram in entry["trigrams"]:
+            paths = self.postings.get(trigram)
+            if paths:
+                paths.discard(relative_path)
+                if not paths:
+                    del self.postings[trigram]
+
+    def _candidates(self, pattern):
+        # Intersect the postings of every trigram in the pattern's required literals
+        candidates = None
+        for literal in _required_literals(pattern):
+            literal = literal.lower()
+            for i in range(len(literal) - 2):
+                paths = self.postings.get(literal[i:i + 3], set())
+                candidates = set(paths) if candidates is None else candidates & paths
+                if not candidates:
+                    return set()
+        return set(self.files) if candidates is None else candidates
+
+
+def _required_literals(pattern):
+    # Runs of plain characters at the top level of a regex must appear in every
+    # match. Anything else (classes, groups, repeats, alternation) ends a run, so
+    # the result is conservative; unparseable patterns give no filter at all.
+    if sre_parser is None:
+        return []
+
+    literals = []
+    current = []
+    try:
+        for op, value in sre_parser.parse(pattern):
+            if op is sre_constants.LITERAL:
+                current.append(chr(value))
+            else:
+                literals.append("".join(current))
+                current = []
+    except Exception:
+        return []
+    literals.append("".join(current))
+    return [literal for literal in literals if len(literal) >= 3]
+
+
+def _python_symbols(text):
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return []
+
+    symbols = []
+
+    def visit(node, prefix):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.ClassDef):
+                symbols.append((prefix + child.name, "class", child.lineno))
+                visit(child, prefix + child.name + ".")
+            elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                kind = "method" if prefix else "function"
+                symbols.append((prefix + child.name, kind, child.lineno))
+            elif isinstance(child, ast.Assign) and not prefix:
+                for target in child.targets:
+                    if isinstance(target, ast.Name):
+                        symbols.append((target.id, "variable", child.lineno))
+
+    visit(tree, "")
+    return symbols
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(root):
+    # One index per working directory; callers hold index.lock while using it
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = _indexes[root] = CodeIndex(root)
+    return index
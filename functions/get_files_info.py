@@ -1,87 +1,366 @@
+import fnmatch
+import mmap
 import os
+import re
+import signal
 import subprocess
-from google.genai import types
-
-schema_get_file_content = types.FunctionDeclaration(
-    name="get_file_content",
-    description="Gets the content of a specified file, constrained to the working directory.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description="The file to read, relative to the working directory.",
-            ),
-        },
-        required=["file_path"],
-    ),
-)
-
-schema_run_python_file = types.FunctionDeclaration(
-    name="run_python_file",
-    description="Runs a specified Python file with an optional list of arguments. Must be constrained to the working directory.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description="The file to run, relative to the working directory.",
-            ),
-            "args": types.Schema(
-                type=types.Type.ARRAY,
-                items=types.Schema(type=types.Type.STRING),
-                description="Optional list of arguments to pass to the Python file.",
-            ),
-        },
-        required=["file_path"],
-    ),
-)
-
-schema_write_file = types.FunctionDeclaration(
-    name="write_file",
-    description="Writes content to a file, constrained to the working directory. Overwrites any existing content.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description="The file to write to, relative to the working directory.",
-            ),
-            "content": types.Schema(
-                type=types.Type.STRING,
-                description="The content to write to the file.",
-            ),
-        },
-        required=["file_path", "content"],
-    ),
-)
-
-schema_get_files_info = types.FunctionDeclaration(
-    name="get_files_info",
-    description="Lists files in the specified directory along with their sizes, constrained to the working directory.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "directory": types.Schema(
-                type=types.Type.STRING,
-                description="The directory to list files from, relative to the working directory. If not provided, lists files in the working directory itself.",
-            ),
-        },
-    ),
-)
-
-available_functions = types.Tool(
-    function_declarations=[
-        schema_get_files_info,
-        schema_get_file_content,
-        schema_run_python_file,
-        schema_write_file,
-    ]
-)
-
-
-
-def get_files_info(working_directory, directory='.'):
+import threading
+import time
+from collections import OrderedDict
+from functions.code_index import get_index
+from functions.output_capture import STOP_AFTER_BYTES, read_streams
+from functions.patching import apply_search_replace, apply_unified_diff, atomic_write
+from functions.python_pool import WarmPythonPool
+
+# Largest page get_file_content returns in one call
+MAX_CHARS = 10000
+
+# Largest number of entries get_files_info returns in one call
+MAX_ENTRIES = 500
+
+# Longest line search_code shows per match
+MAX_LINE_CHARS = 200
+
+# How many leading bytes are checked for NUL when detecting binary files
+BINARY_SNIFF_BYTES = 8192
+
+# Default and largest number of bytes of stdout (and of stderr) run_python_file
+# returns; longer output keeps its head and tail with the middle elided
+DEFAULT_OUTPUT_BYTES = 10000
+MAX_OUTPUT_BYTES = 50000
+
+# The directory tools are confined to unless the caller picks another
+DEFAULT_WORKING_DIRECTORY = "./calculator"
+
+# Default and largest timeout, in seconds, for run_python_file
+DEFAULT_TIMEOUT = 30
+MAX_TIMEOUT = 300
+
+
+def _build_declarations():
+    from google.genai import types
+
+    schema_get_file_content = types.FunctionDeclaration(
+        name="get_file_content",
+        description=f"Gets the content of a specified file, constrained to the working directory. Returns at most {MAX_CHARS} bytes per call; longer files end with a note giving the offset of the next page.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "file_path": types.Schema(
+                    type=types.Type.STRING,
+                    description="The file to read, relative to the working directory.",
+                ),
+                "offset": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Optional byte offset to start reading from. Use the offset from a truncation note to read the next page.",
+                ),
+                "length": types.Schema(
+                    type=types.Type.INTEGER,
+                    description=f"Optional maximum number of bytes to return (at most {MAX_CHARS}).",
+                ),
+                "start_line": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Optional first line to return (1-based). Reads by line instead of by byte offset.",
+                ),
+                "end_line": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Optional last line to return (1-based, inclusive).",
+                ),
+            },
+            required=["file_path"],
+        ),
+    )
+
+    schema_run_python_file = types.FunctionDeclaration(
+        name="run_python_file",
+        description=f"Runs a specified Python file with an optional list of arguments. Must be constrained to the working directory. Returns at most {DEFAULT_OUTPUT_BYTES} bytes each of stdout and stderr by default; longer output keeps its beginning and end with the middle elided.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "file_path": types.Schema(
+                    type=types.Type.STRING,
+                    description="The file to run, relative to the working directory.",
+                ),
+                "args": types.Schema(
+                    type=types.Type.ARRAY,
+                    items=types.Schema(type=types.Type.STRING),
+                    description="Optional list of arguments to pass to the Python file.",
+                ),
+                "timeout": types.Schema(
+                    type=types.Type.NUMBER,
+                    description=f"Seconds before the script is stopped. Defaults to {DEFAULT_TIMEOUT}; at most {MAX_TIMEOUT}.",
+                ),
+                "max_output_bytes": types.Schema(
+                    type=types.Type.INTEGER,
+                    description=f"Bytes of stdout and of stderr to return. Defaults to {DEFAULT_OUTPUT_BYTES}; at most {MAX_OUTPUT_BYTES}.",
+                ),
+            },
+            required=["file_path"],
+        ),
+    )
+
+    schema_write_file = types.FunctionDeclaration(
+        name="write_file",
+        description="Writes content to a file, constrained to the working directory. Overwrites any existing content.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "file_path": types.Schema(
+                    type=types.Type.STRING,
+                    description="The file to write to, relative to the working directory.",
+                ),
+                "content": types.Schema(
+                    type=types.Type.STRING,
+                    description="The content to write to the file.",
+                ),
+            },
+            required=["file_path", "content"],
+        ),
+    )
+
+    schema_edit_file = types.FunctionDeclaration(
+        name="edit_file",
+        description="Edits an existing file in place, constrained to the working directory, without resending its whole content. Give either search/replace edits or a unified diff. Every edit is checked against the current content first; if any does not match, nothing is written.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "file_path": types.Schema(
+                    type=types.Type.STRING,
+                    description="The file to edit, relative to the working directory.",
+                ),
+                "edits": types.Schema(
+                    type=types.Type.ARRAY,
+                    items=types.Schema(
+                        type=types.Type.OBJECT,
+                        properties={
+                            "search": types.Schema(
+                                type=types.Type.STRING,
+                                description="Exact text to find; must occur exactly once in the file.",
+                            ),
+                            "replace": types.Schema(
+                                type=types.Type.STRING,
+                                description="Text to put in its place.",
+                            ),
+                        },
+                        required=["search", "replace"],
+                    ),
+                    description="Optional. Search/replace edits, applied in order.",
+                ),
+                "diff": types.Schema(
+                    type=types.Type.STRING,
+                    description="Optional. A unified diff of this one file (hunks starting with '@@ -l,n +l,n @@').",
+                ),
+            },
+            required=["file_path"],
+        ),
+    )
+
+    schema_get_files_info = types.FunctionDeclaration(
+        name="get_files_info",
+        description=f"Lists files in the specified directory along with their sizes, constrained to the working directory. Can list a whole tree in one call with recursive=true. Returns at most {MAX_ENTRIES} entries per call; longer listings end with a note giving the offset of the next page.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "directory": types.Schema(
+                    type=types.Type.STRING,
+                    description="The directory to list files from, relative to the working directory. If not provided, lists files in the working directory itself.",
+                ),
+                "recursive": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="Optional. If true, also lists the contents of subdirectories, with paths relative to the listed directory.",
+                ),
+                "max_depth": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Optional. When recursive, how many levels of subdirectories to descend (1 lists the directory and its immediate subdirectories).",
+                ),
+                "include": types.Schema(
+                    type=types.Type.ARRAY,
+                    items=types.Schema(type=types.Type.STRING),
+                    description="Optional glob patterns, e.g. [\"*.py\"]. If given, only files matching one of them are listed.",
+                ),
+                "exclude": types.Schema(
+                    type=types.Type.ARRAY,
+                    items=types.Schema(type=types.Type.STRING),
+                    description="Optional glob patterns for files and directories to skip, e.g. [\"__pycache__\"].",
+                ),
+                "use_ignore_files": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="Optional. Skip paths listed in .gitignore files and the .git directory. Defaults to true for recursive listings.",
+                ),
+                "offset": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Optional number of entries to skip. Use the offset from a truncation note to see the next page.",
+                ),
+                "limit": types.Schema(
+                    type=types.Type.INTEGER,
+                    description=f"Optional maximum number of entries to return (default and maximum {MAX_ENTRIES}).",
+                ),
+            },
+        ),
+    )
+
+    schema_search_code = types.FunctionDeclaration(
+        name="search_code",
+        description="Searches the working directory through an index and returns matching lines as path:line: text. Use it to find where something is defined or used instead of reading whole files.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "query": types.Schema(
+                    type=types.Type.STRING,
+                    description="A regular expression to search file contents for, or a symbol name when kind is \"symbol\".",
+                ),
+                "kind": types.Schema(
+                    type=types.Type.STRING,
+                    description="Optional. \"regex\" (default) searches file contents; \"symbol\" looks up Python classes, functions, methods and module variables by name.",
+                ),
+                "ignore_case": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="Optional. Match the regular expression case-insensitively.",
+                ),
+                "max_results": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Optional maximum number of results to return (default 50).",
+                ),
+            },
+            required=["query"],
+        ),
+    )
+
+    available_functions = types.Tool(
+        function_declarations=[
+            schema_get_files_info,
+            schema_get_file_content,
+            schema_run_python_file,
+            schema_write_file,
+            schema_edit_file,
+            schema_search_code,
+        ]
+    )
+
+    declarations = {name: value for name, value in locals().items() if name.startswith("schema_")}
+    declarations["available_functions"] = available_functions
+    return declarations
+
+
+# The FunctionDeclarations are built on first use, so importing this module (and
+# main.py's usage-error path) does not pay for importing the SDK.
+_declarations = None
+_declarations_lock = threading.Lock()
+
+
+def get_available_functions():
+    global _declarations
+    with _declarations_lock:
+        if _declarations is None:
+            _declarations = _build_declarations()
+    return _declarations["available_functions"]
+
+
+def __getattr__(name):
+    # Keeps module.available_functions and module.schema_* working, built lazily
+    if name == "available_functions" or name.startswith("schema_"):
+        get_available_functions()
+        if name in _declarations:
+            return _declarations[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class ResultCache:
+    """
+    LRU cache for the results of get_file_content.
+
+    Keys carry the file's absolute path plus its inode, mtime_ns and size, so a file
+    changed on disk simply misses. Directory listings are not cached: they report
+    the size of every entry, which changes without touching the directory's mtime,
+    so checking a cached listing would cost as much as listing again.
+
+    Args:
+        max_entries (int): Maximum number of cached results before the least
+            recently used one is evicted.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            result = self.entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return result
+
+    def put(self, key, result):
+        with self.lock:
+            self.entries[key] = result
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, abs_path):
+        # Drop cached content for abs_path, in case a write keeps its mtime and size
+        with self.lock:
+            for key in list(self.entries):
+                if key[1] == abs_path:
+                    del self.entries[key]
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        hit_rate = 100 * self.hits / lookups if lookups else 0.0
+        return (
+            f"{self.hits} hits, {self.misses} misses, {self.evictions} evictions "
+            f"({hit_rate:.0f}% hit rate)"
+        )
+
+
+result_cache = ResultCache()
+
+# Warm interpreters for run_python_file; None (the default) starts a fresh
+# interpreter per call. Turned on with enable_python_pool().
+python_pool = None
+
+
+def enable_python_pool(size=2):
+    global python_pool
+    if python_pool is None:
+        python_pool = WarmPythonPool(size=size)
+    return python_pool
+
+
+def get_python_pool():
+    return python_pool
+
+
+def get_files_info(working_directory, directory='.', recursive=False, max_depth=None, include=None, exclude=None, use_ignore_files=None, offset=0, limit=MAX_ENTRIES):
+    """
+    Lists a directory, optionally recursively, using os.scandir.
+
+    Each entry's size comes from its DirEntry (a single stat) and is_dir from the
+    directory read itself, instead of separate getsize/isdir calls per entry.
+
+    Args:
+        working_directory (str): The root directory listings are constrained to.
+        directory (str): The directory to list, relative to the working_directory.
+        recursive (bool): Also list the contents of subdirectories.
+        max_depth (int): How many levels of subdirectories to descend when recursive
+            (unlimited if not given).
+        include (list): Glob patterns; if given, only files matching one are listed.
+        exclude (list): Glob patterns for files and directories to skip entirely.
+        use_ignore_files (bool): Skip paths matched by .gitignore files (and .git).
+            Defaults to the value of recursive.
+        offset (int): Number of entries to skip, for paging through large listings.
+        limit (int): Maximum number of entries to return (capped at MAX_ENTRIES).
+
+    Returns:
+        str: One line per entry, or an error message.
+    """
     #join paths
     current_path = os.path.join(working_directory, directory)
 
@@ -99,29 +378,114 @@ def get_files_info(working_directory, directory='.'):
         return f'Error: "{directory}" is not a directory'
     
     try:
-        # Return string listing contents of the directory
-        directory_contents = os.listdir(abs_current_path)
-
-         # Building the formatted strings
+        # The model passes numbers as JSON, which may arrive as floats
+        if not recursive:
+            max_depth = 0
+        elif max_depth is not None:
+            max_depth = int(max_depth)
+        if use_ignore_files is None:
+            use_ignore_files = bool(recursive)
+        include = tuple(include or ())
+        exclude = tuple(exclude or ())
+        offset = max(int(offset), 0)
+        limit = min(max(int(limit), 1), MAX_ENTRIES)
+
+        # Building the formatted strings, stopping one past the page to detect more
         result_lines = []
-
-        for item in directory_contents:
-            item_path = os.path.join(abs_current_path, item)
-            file_size = os.path.getsize(item_path)
-            is_directory = os.path.isdir(item_path)
+        entries = _scan_directory(abs_current_path, "", 0, max_depth, include, exclude, use_ignore_files, ())
+        for index, (item, file_size, is_directory) in enumerate(entries):
+            if index < offset:
+                continue
+            if len(result_lines) == limit:
+                result_lines.append(f"[...More entries not shown. Call get_files_info with offset={offset + limit} to see the next page]")
+                break
             
             line = f"- {item}: file_size={file_size} bytes, is_dir={is_directory}"
             result_lines.append(line)
         
         return "\n".join(result_lines)
 
+    except Exception as e:
+        return f'Error: {str(e)}'
+
 
+def _scan_directory(abs_path, relative_path, depth, max_depth, include, exclude, use_ignore_files, ignore_patterns):
+    # Yields (relative path, size, is_dir) in sorted, depth-first order
+    if use_ignore_files:
+        ignore_patterns = ignore_patterns + _read_ignore_file(abs_path)
 
+    with os.scandir(abs_path) as scanner:
+        entries = sorted(scanner, key=lambda entry: entry.name)
 
-    except Exception as e:
-        return f'Error: {str(e)}'
+    for entry in entries:
+        item = relative_path + entry.name
+        is_directory = entry.is_dir()
+        if use_ignore_files and (entry.name == ".git" or _is_ignored(entry.name, item, is_directory, ignore_patterns)):
+            continue
+        if exclude and _matches(entry.name, item, exclude):
+            continue
+
+        if not include or (not is_directory and _matches(entry.name, item, include)):
+            yield item, entry.stat().st_size, is_directory
+
+        # Never follow symlinked directories, so links cannot create cycles
+        if is_directory and not entry.is_symlink() and (max_depth is None or depth < max_depth):
+            try:
+                yield from _scan_directory(entry.path, item + "/", depth + 1, max_depth, include, exclude, use_ignore_files, ignore_patterns)
+            except PermissionError:
+                continue
+
+
+def _read_ignore_file(abs_path):
+    # Simple .gitignore support: glob patterns, "#" comments, trailing "/" for
+    # directories only. Negated ("!") patterns are not supported and are skipped.
+    try:
+        with open(os.path.join(abs_path, ".gitignore"), "r") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return ()
+
+    patterns = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#") or line.startswith("!"):
+            continue
+        directory_only = line.endswith("/")
+        patterns.append((line.strip("/"), directory_only))
+    return tuple(patterns)
+
+
+def _is_ignored(name, item, is_directory, ignore_patterns):
+    for pattern, directory_only in ignore_patterns:
+        if directory_only and not is_directory:
+            continue
+        if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(item, pattern):
+            return True
+    return False
+
+
+def _matches(name, item, patterns):
+    return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(item, pattern) for pattern in patterns)
+
+def get_file_content(working_directory, file_path, offset=0, length=MAX_CHARS, start_line=None, end_line=None):
+    """
+    Reads part of a file through mmap, so large files are never decoded in full.
 
-def get_file_content(working_directory, file_path):
+    Without arguments the first MAX_CHARS bytes are returned. offset/length select a
+    byte range; start_line/end_line (1-based, inclusive) select a line range instead.
+    A result cut short ends with a note giving the offset of the next page.
+
+    Args:
+        working_directory (str): The root directory files may be read from.
+        file_path (str): The relative path to the file from the working_directory.
+        offset (int): Byte offset to start reading at.
+        length (int): Maximum number of bytes to return (capped at MAX_CHARS).
+        start_line (int): First line to return, if reading by line.
+        end_line (int): Last line to return, if reading by line.
+
+    Returns:
+        str: The requested content, or an error message.
+    """
 
     # get absolute paths for comparison
 
@@ -150,23 +514,143 @@ def get_file_content(working_directory, file_path):
         # Return string, listing contents of the file
         #file_content_string = os.listdir(abs_current_path)
 
-        MAX_CHARS = 10000
+        # The model passes numbers as JSON, which may arrive as floats
+        offset = max(int(offset), 0)
+        length = min(max(int(length), 0), MAX_CHARS)
+        line_range = None
+        if start_line is not None or end_line is not None:
+            line_range = (max(int(start_line or 1), 1), int(end_line) if end_line is not None else None)
+
+        # Serve cached content if the file is unchanged (same inode, mtime and size)
+        stat_result = os.stat(abs_current_path)
+        cache_key = (
+            "get_file_content",
+            abs_current_path,
+            stat_result.st_ino,
+            stat_result.st_mtime_ns,
+            stat_result.st_size,
+            file_path,
+            offset,
+            length,
+            line_range,
+        )
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        size = stat_result.st_size
+        if size == 0:
+            return ""
+
+        with open(abs_current_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # A NUL byte near the start means this is not a text file
+            if mm.find(b"\0", 0, BINARY_SNIFF_BYTES) != -1:
+                return f'Error: "{file_path}" appears to be a binary file ({size} bytes)'
+
+            if line_range:
+                offset, stop = _line_span(mm, size, *line_range)
+            else:
+                stop = size
+            start = _char_boundary(mm, size, min(offset, size))
+            end = _char_boundary(mm, size, min(start + length, stop))
+            if end <= start < stop:
+                # A page must hold at least one whole character, or the next
+                # page would start at the same offset
+                end = start + 1
+                while end < stop and mm[end] & 0xC0 == 0x80:
+                    end += 1
+            file_string = mm[start:end].decode("utf-8", errors="replace")
+
+        if end < stop:
+            file_string += (
+                f'[...File "{file_path}" truncated: showing bytes {start}-{end} of {size}. '
+                f'Call get_file_content with offset={end} to read the next page]'
+            )
+
+        result_cache.put(cache_key, file_string)
+        return file_string
 
-        with open(abs_current_path, "r") as f:
-            file_string = f.read(MAX_CHARS + 1)
-        
-            
-        if len(file_string) > MAX_CHARS:
-            file_string = file_string[:MAX_CHARS] + f'[...File "{file_path}" truncated at 10000 characters]'
-                 
-            return file_string    
-        else:
+    except Exception as e:
+        return f'Error: {str(e)}'
+   
+def _line_span(mm, size, start_line, end_line=None):
+    # Byte offsets spanning lines start_line..end_line (1-based, inclusive)
+    start = 0
+    for _ in range(start_line - 1):
+        newline = mm.find(b"\n", start)
+        if newline == -1:
+            return size, size
+        start = newline + 1
+    if end_line is None:
+        return start, size
+
+    stop = start
+    for _ in range(max(end_line - start_line + 1, 0)):
+        newline = mm.find(b"\n", stop)
+        if newline == -1:
+            return start, size
+        stop = newline + 1
+    return start, stop
+
+
+def _char_boundary(mm, size, position):
+    # Step back off UTF-8 continuation bytes so a page never splits a character
+    while 0 < position < size and mm[position] & 0xC0 == 0x80:
+        position -= 1
+    return position
+
+def search_code(working_directory, query, kind="regex", ignore_case=False, max_results=50):
+    """
+    Searches the working directory through an incrementally updated index.
+
+    Regex searches only scan the files whose trigrams contain the pattern's literal
+    text; symbol searches use a table of Python definitions built with ast.
+
+    Args:
+        working_directory (str): The root directory to search.
+        query (str): A regular expression, or a symbol name when kind is "symbol".
+        kind (str): "regex" or "symbol".
+        ignore_case (bool): Match the regular expression case-insensitively.
+        max_results (int): Maximum number of results to return.
 
-            return file_string
+    Returns:
+        str: One "path:line: text" result per line, or an error message.
+    """
+    abs_working_dir = os.path.abspath(working_directory)
+    max_results = max(int(max_results), 1)
+
+    try:
+        index = get_index(abs_working_dir)
+        with index.lock:
+            # Re-stat the tree and re-read only files that changed since the last query
+            index.refresh()
+
+            if kind == "symbol":
+                symbols, total = index.find_symbols(query, max_results)
+                result_lines = [
+                    f"{path}:{line_number}: {symbol_kind} {name}"
+                    for path, line_number, symbol_kind, name in symbols
+                ]
+            elif kind == "regex":
+                matches, total = index.search(query, ignore_case=bool(ignore_case), max_results=max_results)
+                result_lines = [
+                    f"{path}:{line_number}: {line.strip()[:MAX_LINE_CHARS]}"
+                    for path, line_number, line in matches
+                ]
+            else:
+                return f'Error: Unknown search kind "{kind}". Use "regex" or "symbol".'
+
+        if not result_lines:
+            return f'No matches for "{query}"'
+        if total > len(result_lines):
+            result_lines.append(f"[...{total - len(result_lines)} more matches not shown. Narrow the query or raise max_results]")
+        return "\n".join(result_lines)
 
+    except re.error as e:
+        return f'Error: Invalid regular expression "{query}": {e}'
     except Exception as e:
         return f'Error: {str(e)}'
-   
+
 def write_file(working_directory, file_path, content):
     """
     Writes content to a file, ensuring the file path is within the specified working directory.
@@ -203,10 +687,12 @@ def write_file(working_directory, file_path, content):
         if dir_name:
             os.makedirs(dir_name, exist_ok=True)
                 
-        # Open the file in write mode ("w") which will create the file if it doesn't
-        # exist or overwrite its contents if it does.
-        with open(full_path, "w") as f:
-            f.write(content)
+        # Write to a temp file and swap it in, creating the file if it doesn't
+        # exist or replacing its contents if it does.
+        atomic_write(abs_full_path, content)
+
+        # Cached reads of this file and any directory listing are now stale.
+        result_cache.invalidate(abs_full_path)
     
         # Return a success message with the number of characters written.
         return f'Successfully wrote to "{file_path}" ({len(content)} characters written)'
@@ -215,7 +701,60 @@ def write_file(working_directory, file_path, content):
         # Catch any potential errors during the process and return an error message.
         return f'Error: {str(e)}'
 
-def run_python_file(working_directory, file_path, args=None):
+def edit_file(working_directory, file_path, edits=None, diff=None):
+    """
+    Applies search/replace edits or a unified diff to an existing file.
+
+    The new content is computed in full and every edit validated against the current
+    content before anything is written; the result then replaces the file
+    atomically, so a bad hunk or a failed write never leaves a half-edited file.
+
+    Args:
+        working_directory (str): The root directory where files are allowed to be written.
+        file_path (str): The relative path to the file from the working_directory.
+        edits (list): Dicts with "search" and "replace" text, applied in order.
+        diff (str): A unified diff of this file.
+
+    Returns:
+        str: A success message if the edit is applied, or an error message otherwise.
+    """
+    abs_working_dir = os.path.abspath(working_directory)
+    abs_full_path = os.path.abspath(os.path.join(working_directory, file_path))
+
+    if not abs_full_path.startswith(abs_working_dir):
+        return f'Error: Cannot edit "{file_path}" as it is outside the permitted working directory'
+
+    if not os.path.isfile(abs_full_path):
+        return f'Error: File not found or is not a regular file: "{file_path}". Use write_file to create it.'
+
+    if bool(edits) == bool(diff):
+        return 'Error: Provide either "edits" or "diff", not both or neither.'
+
+    try:
+        # newline="" keeps the file's own line endings intact
+        with open(abs_full_path, "r", newline="") as f:
+            content = f.read()
+
+        if edits:
+            new_content = apply_search_replace(content, [dict(edit) for edit in edits])
+            applied = f"{len(edits)} edit{'s' if len(edits) != 1 else ''}"
+        else:
+            new_content, hunks = apply_unified_diff(content, diff)
+            applied = f"{hunks} hunk{'s' if hunks != 1 else ''}"
+
+        atomic_write(abs_full_path, new_content)
+
+        # Cached reads of this file and any directory listing are now stale.
+        result_cache.invalidate(abs_full_path)
+
+        return f'Successfully edited "{file_path}" ({applied} applied, {len(new_content)} characters now)'
+
+    except ValueError as e:
+        return f'Error: Nothing was written to "{file_path}": {e}'
+    except Exception as e:
+        return f'Error: {str(e)}'
+
+def run_python_file(working_directory, file_path, args=None, timeout=DEFAULT_TIMEOUT, max_output_bytes=DEFAULT_OUTPUT_BYTES):
     
     """
     FUNCTION"
@@ -223,10 +762,18 @@ def run_python_file(working_directory, file_path, args=None):
     This allows ai agent to execute python code. It ensures the file path is within the specified working directory.
     If the directory for the file does not exist, or if not with in correct directory, code will not attempt to execute.
 
+    Output is read from the pipes as it is produced and only the first and last
+    max_output_bytes // 2 bytes of each stream are kept, so a chatty script cannot
+    exhaust memory or the prompt. A script that runs past the timeout, or prints
+    more than STOP_AFTER_BYTES in total, is killed.
+
     Args:
         working_directory (str): The root directory where files are allowed to be written.
         file_path (str): The relative path to the file from the working_directory.
         args (list): A list of additional command-line arguments to pass to the script.
+        timeout (float): Seconds before the script is stopped, capped at MAX_TIMEOUT.
+        max_output_bytes (int): Bytes of stdout and of stderr to return, capped at
+            MAX_OUTPUT_BYTES.
         
 
     Returns:
@@ -235,6 +782,10 @@ def run_python_file(working_directory, file_path, args=None):
     if args is None:
         args = []
 
+    # The model may send these as floats or strings; keep them within bounds
+    timeout = min(max(float(timeout), 0.1), MAX_TIMEOUT)
+    max_output_bytes = min(max(int(max_output_bytes), 200), MAX_OUTPUT_BYTES)
+
     # Get absolute paths for security checks
     abs_working_dir = os.path.abspath(working_directory)
     full_path = os.path.join(abs_working_dir, file_path)
@@ -257,38 +808,63 @@ def run_python_file(working_directory, file_path, args=None):
     
     # Execute Python file 
     try:
-        result = subprocess.run(
-            command,
-            cwd=abs_working_dir,
-            capture_output=True,
-            text=True,  # Decode stdout and stderr as text
-            timeout=30,
-            check=True  # Raise an exception if the command returns a non-zero exit code
-        )
-        
-        # If execution is successful and `check=True` is not triggered
-        return f'Execution successful.\nSTDOUT:\n{result.stdout}\nSTDERR:\n{result.stderr}'
+        if python_pool is not None:
+            result = python_pool.run(abs_full_path, args, abs_working_dir, timeout, max_output_bytes)
+            returncode, stdout, stderr, stopped = result["returncode"], result["stdout"], result["stderr"], result["stopped"]
+        else:
+            # Its own session, so a timeout can kill anything the script started
+            process = subprocess.Popen(
+                command,
+                cwd=abs_working_dir,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                start_new_session=True,
+            )
+            deadline = time.monotonic() + timeout
+            with process:
+                outputs, stopped = read_streams(
+                    [process.stdout.fileno(), process.stderr.fileno()], max_output_bytes, timeout
+                )
+                if not stopped:
+                    # The pipes can close long before the script exits
+                    try:
+                        process.wait(timeout=max(deadline - time.monotonic(), 0))
+                    except subprocess.TimeoutExpired:
+                        stopped = "timeout"
+                if stopped:
+                    os.killpg(process.pid, signal.SIGKILL)
+                returncode = process.wait()
+            stdout, stderr = (output.text() for output in outputs)
+
+        if stopped == "timeout":
+            return f'Error: The Python script timed out after {timeout:g} seconds.\nStdout:\n{stdout}\nStderr:\n{stderr}'
+        if stopped == "output_limit":
+            return f'Error: The Python script was stopped after printing more than {STOP_AFTER_BYTES} bytes.\nStdout:\n{stdout}\nStderr:\n{stderr}'
+        if returncode != 0:
+            return f'Error: The Python script returned a non-zero exit code.\nReturn code: {returncode}\nStdout:\n{stdout}\nStderr:\n{stderr}'
+
+        # If execution is successful
+        return f'Execution successful.\nSTDOUT:\n{stdout}\nSTDERR:\n{stderr}'
         
-    except subprocess.CalledProcessError as e:
-        return f'Error: The Python script returned a non-zero exit code.\nReturn code: {e.returncode}\nStdout:\n{e.stdout}\nStderr:\n{e.stderr}'
-    except subprocess.TimeoutExpired:
-        return f'Error: The Python script timed out after 30 seconds.'
     except FileNotFoundError:
         return f'Error: The "python" command was not found. Please ensure Python is installed and in your system\'s PATH.'
     except Exception as e:
         return f'Big Bad Errorrr: {e}'
     
-def call_function(function_call_part, verbose=False):
+def call_function(function_call_part, verbose=False, working_directory=DEFAULT_WORKING_DIRECTORY):
     """
     Calls a specified function based on the LLM's function call part.
     
     Args:
         function_call_part (types.FunctionCall): The function call object from the LLM.
         verbose (bool): If True, prints verbose output.
+        working_directory (str): The directory the tools are confined to.
         
     Returns:
         types.Content: A Content object containing the function's result or an error.
     """
+    from google.genai import types
+
     function_name = function_call_part.name
     function_args = dict(function_call_part.args)
     
@@ -309,7 +885,7 @@ def call_function(function_call_part, verbose=False):
         )
 
     # Manually add the working directory for security
-    function_args["working_directory"] = "./calculator"
+    function_args["working_directory"] = working_directory
 
     try:
         # Call the function using the dictionary of keyword arguments.
@@ -342,4 +918,15 @@ function_map = {
     "get_file_content": get_file_content,
     "run_python_file": run_python_file,
     "write_file": write_file,
+    "edit_file": edit_file,
+    "search_code": search_code,
+}
+
+# Functions that do not modify the working directory. Calls to these from one
+# model turn may run concurrently; anything else runs alone, in call order.
+parallel_safe_functions = {
+    "get_files_info",
+    "get_file_content",
+    "run_python_file",
+    "search_code",
 }
\ No newline at end of file
@@ -0,0 +1,118 @@
+import os
+import select
+import selectors
+import time
+
+# A script is stopped once it has written this many bytes to stdout and stderr
+# combined; past that point only the tail is still changing.
+STOP_AFTER_BYTES = 10_000_000
+
+READ_CHUNK_BYTES = 65536
+
+
+class CappedOutput:
+    """
+    Bounded buffer for one output stream.
+
+    Keeps the first and last max_bytes // 2 bytes written to it and counts the rest,
+    so memory use stays fixed however much the script prints.
+
+    Args:
+        max_bytes (int): Total number of bytes retained (head plus tail).
+    """
+
+    def __init__(self, max_bytes):
+        self.head_bytes = max_bytes // 2
+        self.tail_bytes = max_bytes - self.head_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def feed(self, data):
+        self.total += len(data)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self.tail += data
+            if len(self.tail) > self.tail_bytes:
+                del self.tail[:len(self.tail) - self.tail_bytes]
+
+    @property
+    def elided(self):
+        return self.total - len(self.head) - len(self.tail)
+
+    def text(self):
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        if not self.elided:
+            return head + tail
+        return f"{head}\n[... {self.elided} bytes of output elided ...]\n{tail}"
+
+
+def read_streams(fds, max_bytes, timeout, stop_after_bytes=STOP_AFTER_BYTES):
+    """
+    Reads the given pipes until they all close, the timeout expires or the combined
+    output passes stop_after_bytes.
+
+    Args:
+        fds (list): Read ends of the pipes, e.g. the child's stdout and stderr.
+        max_bytes (int): Bytes retained per stream.
+        timeout (float): Seconds before reading stops.
+        stop_after_bytes (int): Combined output size at which reading stops.
+
+    Returns:
+        tuple: A CappedOutput per fd, and why reading stopped early: None if every
+            pipe closed, otherwise "timeout" or "output_limit". The caller is expected
+            to kill the child in the latter cases.
+    """
+    outputs = [CappedOutput(max_bytes) for _ in fds]
+    deadline = time.monotonic() + timeout
+    total = 0
+
+    with selectors.DefaultSelector() as selector:
+        for fd, output in zip(fds, outputs):
+            selector.register(fd, selectors.EVENT_READ, output)
+
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return outputs, "timeout"
+            for key, _ in selector.select(remaining):
+                data = os.read(key.fd, READ_CHUNK_BYTES)
+                if not data:
+                    selector.unregister(key.fd)
+                    continue
+                key.data.feed(data)
+                total += len(data)
+                if total > stop_after_bytes:
+                    return outputs, "output_limit"
+
+    return outputs, None
+
+
+def wait_pid(pid, timeout):
+    """
+    Waits up to timeout seconds for a child process to exit and reaps it.
+
+    Returns:
+        int: The child's wait status, or None if it was still running at the timeout.
+    """
+    if hasattr(os, "pidfd_open"):
+        pidfd = os.pidfd_open(pid)
+        try:
+            if not select.select([pidfd], [], [], max(timeout, 0))[0]:
+                return None
+        finally:
+            os.close(pidfd)
+        return os.waitpid(pid, 0)[1]
+
+    deadline = time.monotonic() + timeout
+    while True:
+        reaped, status = os.waitpid(pid, os.WNOHANG)
+        if reaped:
+            return status
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(0.005)
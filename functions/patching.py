@@ -0,0 +1,190 @@
+import os
+import re
+import tempfile
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+# Lines before the first hunk that belong to the diff's file header
+FILE_HEADER_PREFIXES = ("diff ", "index ", "--- ", "+++ ", "new file mode", "deleted file mode")
+
+
+def apply_search_replace(text, edits):
+    """
+    Applies search/replace edits in order. Each search text must occur exactly once
+    in the content as left by the edits before it.
+
+    Args:
+        text (str): Current file content.
+        edits (list): Dicts with "search" and "replace" strings.
+
+    Returns:
+        str: The edited content.
+
+    Raises:
+        ValueError: If a search text is empty, missing or ambiguous.
+    """
+    for number, edit in enumerate(edits, start=1):
+        search = edit.get("search", "")
+        replace = edit.get("replace", "")
+        if not search:
+            raise ValueError(f"edit {number}: search text is empty")
+        count = text.count(search)
+        if count == 0:
+            raise ValueError(f"edit {number}: search text not found in the current content")
+        if count > 1:
+            raise ValueError(
+                f"edit {number}: search text matches {count} times; "
+                "include more surrounding lines to make it unique"
+            )
+        text = text.replace(search, replace, 1)
+    return text
+
+
+def apply_unified_diff(text, diff):
+    """
+    Applies the hunks of a single-file unified diff.
+
+    Hunk line numbers are used as a hint only: each hunk's context and removed lines
+    are located in the current content (trailing whitespace ignored), nearest to the
+    stated position and after the previous hunk, so a diff made against a slightly
+    shifted copy still applies. Line counts in hunk headers are not trusted.
+
+    Args:
+        text (str): Current file content.
+        diff (str): The unified diff.
+
+    Returns:
+        tuple: The edited content and the number of hunks applied.
+
+    Raises:
+        ValueError: If the diff has no hunks or a hunk does not match the content.
+    """
+    hunks = _parse_hunks(diff)
+    if not hunks:
+        raise ValueError("no hunks found in diff (expected lines starting with '@@ -')")
+
+    lines = text.splitlines(keepends=True)
+    newline = "\r\n" if lines and lines[0].endswith("\r\n") else "\n"
+    result = []
+    position = 0
+    for number, (expected, old, new) in enumerate(hunks, start=1):
+        at = _find_block(lines, old, expected, position)
+        if at is None:
+            raise ValueError(_mismatch(number, lines, old, expected))
+
+        result.extend(lines[position:at])
+        replacement = [line + newline for line in new]
+        # Lines added after a last line that has no newline must not join onto it
+        if replacement and at == len(lines) and result and not result[-1].endswith("\n"):
+            result[-1] += newline
+        # Keep a missing final newline missing if the hunk ends at end of file
+        ends_file = at + len(old) == len(lines)
+        if replacement and ends_file and lines and not lines[-1].endswith("\n"):
+            replacement[-1] = replacement[-1][:-len(newline)]
+        result.extend(replacement)
+        position = at + len(old)
+
+    result.extend(lines[position:])
+    return "".join(result), len(hunks)
+
+
+def atomic_write(path, content):
+    # Write to a temp file in the same directory, then swap it in, so readers never
+    # see a partly written file and a failed write leaves the original intact
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "w", newline="") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file 0600; keep the target's mode, or give a new
+        # file the mode open() would have
+        if os.path.exists(path):
+            os.chmod(temp_path, os.stat(path).st_mode & 0o7777)
+        else:
+            os.chmod(temp_path, 0o666 & ~_current_umask())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _current_umask():
+    # Reading it from /proc avoids os.umask's set-and-restore, which would race
+    # with other threads creating files
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except OSError:
+        pass
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
+
+
+def _parse_hunks(diff):
+    # (expected index, old lines, new lines) per hunk
+    hunks = []
+    current = None
+    for line in diff.splitlines():
+        match = HUNK_HEADER.match(line)
+        if match:
+            old_start = int(match.group(1))
+            old_count = 1 if match.group(2) is None else int(match.group(2))
+            # An empty old side ("-5,0") inserts after line 5
+            expected = old_start if old_count == 0 else old_start - 1
+            current = (expected, [], [])
+            hunks.append(current)
+        elif current is None:
+            if line.startswith(FILE_HEADER_PREFIXES) or not line.strip():
+                continue
+            raise ValueError(f"unexpected line before the first hunk: {line!r}")
+        elif line.startswith("\\"):
+            # "\ No newline at end of file"
+            continue
+        elif line.startswith("-"):
+            current[1].append(line[1:])
+        elif line.startswith("+"):
+            current[2].append(line[1:])
+        elif line.startswith(" "):
+            current[1].append(line[1:])
+            current[2].append(line[1:])
+        elif line == "":
+            # Blank context lines often lose their leading space
+            current[1].append("")
+            current[2].append("")
+        else:
+            raise ValueError(f"unexpected line in hunk {len(hunks)}: {line!r}")
+    return hunks
+
+
+def _find_block(lines, block, expected, start):
+    if not block:
+        return min(max(expected, start), len(lines))
+
+    wanted = [line.rstrip() for line in block]
+    best = None
+    for at in range(start, len(lines) - len(block) + 1):
+        if all(lines[at + i].rstrip() == wanted[i] for i in range(len(block))):
+            if best is None or abs(at - expected) < abs(best - expected):
+                best = at
+            elif at > expected:
+                break
+    return best
+
+
+def _mismatch(number, lines, old, expected):
+    # Point at the first line that differs when the hunk is laid at its stated place
+    for i, line in enumerate(old):
+        at = expected + i
+        found = lines[at].rstrip("\r\n") if 0 <= at < len(lines) else None
+        if found is None or found.rstrip() != line.rstrip():
+            break
+    found = "end of file" if found is None else repr(found)
+    return (
+        f"hunk {number} does not match the current content: expected {line!r} "
+        f"at line {at + 1}, found {found}. Re-read the file and regenerate the diff."
+    )
@@ -0,0 +1,283 @@
+import sys
+
+# Modules loaded at interpreter start-up, before anything below; a script's own
+# files cannot shadow these in a fresh interpreter either
+_STARTUP_MODULES = frozenset(sys.modules)
+
+import ast
+import atexit
+import importlib.util
+import json
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+from functions.output_capture import read_streams, wait_pid
+
+# Run with -m, this module is the warm server: a long-lived interpreter that
+# reads one JSON request per line on stdin, forks a child per request to run the
+# script, and writes one JSON response per line on stdout. Imported, it provides
+# WarmPythonPool, the client side used by run_python_file.
+
+
+class WarmPythonPool:
+    """
+    Pool of pre-started Python interpreters that run scripts by forking.
+
+    Each worker is a server process started once. For every run it forks a child
+    that chdirs to the working directory, sets sys.argv, points stdout/stderr at
+    pipes the server reads with a size cap, and executes the script with runpy, so
+    a run pays for a fork
+    instead of a full interpreter start-up. Standard-library modules the script
+    imports are imported into the server before forking, so later runs inherit them
+    already loaded. Names the script's own directory provides are never preloaded,
+    and any such module already in the server is dropped in the child before the
+    script runs, so the script always imports its own (possibly just edited) files.
+
+    Args:
+        size (int): Number of warm servers, i.e. how many scripts can run at once.
+        python (str): The interpreter used for the servers.
+    """
+
+    def __init__(self, size=2, python="python"):
+        self.python = python
+        self.idle = queue.Queue()
+        self.servers = []
+        self.lock = threading.Lock()
+        self.runs = 0
+        self.seconds_saved = 0.0
+        self.cold_start_seconds = self._measure_cold_start()
+        for _ in range(size):
+            self.idle.put(self._start_server())
+        atexit.register(self.close)
+
+    def run(self, script_path, args, cwd, timeout, max_output_bytes):
+        request = {
+            "script": script_path,
+            "args": list(args),
+            "cwd": cwd,
+            "timeout": timeout,
+            "max_output_bytes": max_output_bytes,
+            "preload": script_imports(script_path),
+        }
+        server = self.idle.get()
+        try:
+            started = time.perf_counter()
+            try:
+                response = self._request(server, request)
+            except (OSError, ValueError):
+                # The server died; replace it and retry once
+                server = self._start_server()
+                response = self._request(server, request)
+            elapsed = time.perf_counter() - started
+        finally:
+            self.idle.put(server)
+
+        # A cold run would have paid interpreter start-up on top of the script's own
+        # run time; the pool paid only its fork and round-trip overhead instead.
+        overhead = elapsed - response["seconds"]
+        with self.lock:
+            self.runs += 1
+            self.seconds_saved += max(self.cold_start_seconds - overhead, 0.0)
+        return response
+
+    def summary(self):
+        per_call = 1000 * self.seconds_saved / self.runs if self.runs else 0.0
+        return (
+            f"{self.runs} runs, ~{per_call:.1f} ms saved per call "
+            f"(cold start {1000 * self.cold_start_seconds:.1f} ms)"
+        )
+
+    def close(self):
+        for server in self.servers:
+            if server.poll() is None:
+                server.kill()
+                server.wait()
+
+    def _measure_cold_start(self):
+        started = time.perf_counter()
+        subprocess.run([self.python, "-c", "pass"], check=False)
+        return time.perf_counter() - started
+
+    def _start_server(self):
+        # Started from the repository root so the server can import this package
+        server = subprocess.Popen(
+            [self.python, "-m", "functions.python_pool"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        self.servers.append(server)
+        return server
+
+    def _request(self, server, request):
+        server.stdin.write(json.dumps(request) + "\n")
+        server.stdin.flush()
+        line = server.stdout.readline()
+        if not line:
+            raise OSError("warm Python server exited")
+        return json.loads(line)
+
+
+def script_imports(script_path):
+    # Top-level module names the script imports (absolute imports only)
+    try:
+        with open(script_path, "r") as f:
+            tree = ast.parse(f.read())
+    except (OSError, SyntaxError, ValueError):
+        return []
+
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split(".")[0])
+    return sorted(names)
+
+
+def _local_names(directory):
+    # Top-level module and package names importable from directory
+    names = set()
+    try:
+        entries = os.listdir(directory)
+    except OSError:
+        return names
+    for entry in entries:
+        base, extension = os.path.splitext(entry)
+        if extension in (".py", ".pyc"):
+            names.add(base)
+        elif extension in (".so", ".pyd"):
+            names.add(entry.split(".")[0])
+        elif os.path.isdir(os.path.join(directory, entry)):
+            names.add(entry)
+    return names
+
+
+def _preload(names, local_names):
+    # Only standard-library modules: importing third-party packages can start
+    # threads (e.g. BLAS pools), which are not safe to fork. A name the script's
+    # directory shadows would make the script import the wrong module.
+    for name in names:
+        if name in sys.modules or name not in sys.stdlib_module_names or name in local_names:
+            continue
+        try:
+            if importlib.util.find_spec(name) is not None:
+                __import__(name)
+        except Exception:
+            pass
+
+
+def _run_child(request, stdout_fd, stderr_fd):
+    # Runs in the forked child and never returns
+    code = 1
+    try:
+        os.setsid()
+        os.chdir(request["cwd"])
+        stdin = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(stdin, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+
+        script = request["script"]
+        script_dir = os.path.dirname(script)
+        sys.argv = [script] + request["args"]
+        sys.path.insert(0, script_dir)
+
+        # Forget modules this server loaded that the script's directory shadows,
+        # as a fresh interpreter would never have imported them
+        local_names = _local_names(script_dir)
+        for name in list(sys.modules):
+            top_level = name.partition(".")[0]
+            if top_level in local_names and top_level not in _STARTUP_MODULES:
+                del sys.modules[name]
+
+        import runpy
+        import traceback
+
+        try:
+            runpy.run_path(script, run_name="__main__")
+            code = 0
+        except SystemExit as e:
+            if e.code is None:
+                code = 0
+            elif isinstance(e.code, int):
+                code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+    finally:
+        try:
+            # What interpreter shutdown would do before exiting: join non-daemon
+            # threads, then run atexit handlers, then flush
+            try:
+                threading._shutdown()
+                atexit._run_exitfuncs()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def _handle(request):
+    _preload(request.get("preload", []), _local_names(os.path.dirname(request["script"])))
+
+    stdout_read, stdout_write = os.pipe()
+    stderr_read, stderr_write = os.pipe()
+    sys.stdout.flush()
+    started = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os.close(stdout_read)
+        os.close(stderr_read)
+        _run_child(request, stdout_write, stderr_write)
+
+    os.close(stdout_write)
+    os.close(stderr_write)
+    deadline = time.monotonic() + request["timeout"]
+    try:
+        (stdout, stderr), stopped = read_streams(
+            [stdout_read, stderr_read], request["max_output_bytes"], request["timeout"]
+        )
+        status = None
+        if not stopped:
+            # The pipes can close long before the script exits
+            status = wait_pid(pid, deadline - time.monotonic())
+            if status is None:
+                stopped = "timeout"
+        if stopped:
+            # Kill the script and anything it started
+            os.killpg(pid, signal.SIGKILL)
+        if status is None:
+            _, status = os.waitpid(pid, 0)
+    finally:
+        os.close(stdout_read)
+        os.close(stderr_read)
+
+    return {
+        "returncode": os.waitstatus_to_exitcode(status),
+        "stdout": stdout.text(),
+        "stderr": stderr.text(),
+        "stopped": stopped,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def serve():
+    # The repository root must not shadow modules of the scripts it runs
+    sys.path.pop(0)
+    for line in sys.stdin:
+        response = _handle(json.loads(line))
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    serve()
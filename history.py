@@ -0,0 +1,151 @@
+# Rough characters-per-token ratio used until the first usage_metadata arrives.
+DEFAULT_CHARS_PER_TOKEN = 4.0
+
+# History growth between two calls needed before it recalibrates the ratio;
+# smaller deltas are dominated by token rounding.
+MIN_CALIBRATION_CHARS = 400
+
+ELIDED_MARKER = "characters of earlier tool output elided"
+
+
+class HistoryManager:
+    """
+    Keeps the agent's conversation history within a prompt-token budget.
+
+    The manager works on the same `messages` list the agent loop appends to. Before
+    each model call, compact() replaces tool results that are repeated verbatim later
+    in the history with a short note, then truncates the oldest tool results (keeping
+    their head and tail) until the estimated prompt size fits the budget. The most
+    recent tool results are never touched.
+
+    Token counts per message are estimated from the characters in the message, scaled
+    by a tokens-per-character ratio fitted on how much prompt_token_count grew
+    between calls relative to the history. The prompt also carries the system
+    instruction and tool declarations; that fixed overhead is what remains of the
+    last prompt_token_count after the history's estimate, and it counts against the
+    budget too.
+
+    Args:
+        messages (list): The conversation history, modified in place.
+        token_budget (int): Target prompt size in tokens, overhead included.
+        keep_recent (int): Number of most recent tool results left untouched.
+        keep_chars (int): Characters kept from each end of a truncated tool result.
+    """
+
+    def __init__(self, messages, token_budget=20000, keep_recent=4, keep_chars=400):
+        self.messages = messages
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.keep_chars = keep_chars
+        self.tokens_per_char = 1 / DEFAULT_CHARS_PER_TOKEN
+        self.overhead_tokens = 0
+        self.chars_saved = 0
+        self.prompt_tokens = []
+        self.calibration = None
+
+    def record_usage(self, usage_metadata):
+        # The prompt just sent was the current history plus the fixed overhead, so
+        # growth since the calibration point prices the history alone.
+        if not usage_metadata or not usage_metadata.prompt_token_count:
+            return
+        prompt_tokens = usage_metadata.prompt_token_count
+        self.prompt_tokens.append(prompt_tokens)
+        total_chars = sum(message_chars(message) for message in self.messages)
+        if self.calibration is None:
+            self.calibration = (prompt_tokens, total_chars)
+        else:
+            tokens_delta = prompt_tokens - self.calibration[0]
+            chars_delta = total_chars - self.calibration[1]
+            if chars_delta >= MIN_CALIBRATION_CHARS and tokens_delta > 0:
+                self.tokens_per_char = tokens_delta / chars_delta
+                self.calibration = (prompt_tokens, total_chars)
+            elif chars_delta < 0:
+                # Compaction shrank the history; measure growth from here on
+                self.calibration = (prompt_tokens, total_chars)
+        self.overhead_tokens = max(int(prompt_tokens - total_chars * self.tokens_per_char), 0)
+
+    def message_tokens(self, message):
+        return int(message_chars(message) * self.tokens_per_char)
+
+    def total_tokens(self):
+        return sum(self.message_tokens(message) for message in self.messages)
+
+    @property
+    def tokens_saved(self):
+        return int(self.chars_saved * self.tokens_per_char)
+
+    def compact(self):
+        tool_indexes = [
+            index
+            for index, message in enumerate(self.messages)
+            if message.role == "tool"
+        ]
+        older = tool_indexes[:-self.keep_recent] if self.keep_recent else tool_indexes
+
+        # Drop results that appear again, unchanged, later in the history.
+        older_set = set(older)
+        seen = set()
+        for index in reversed(tool_indexes):
+            key = _result_key(self.messages[index])
+            note = f"[Identical to a later {key[0]} result; see below]"
+            if key in seen and index in older_set and len(note) < len(key[1]):
+                self._replace_result(index, note)
+            seen.add(key)
+
+        # Truncate the oldest tool results until the history fits the budget.
+        total = self.total_tokens() + self.overhead_tokens
+        for index in older:
+            if total <= self.token_budget:
+                break
+            message = self.messages[index]
+            before = self.message_tokens(message)
+            result = _result_text(message)
+            if len(result) <= 2 * self.keep_chars or ELIDED_MARKER in result:
+                continue
+            elided = len(result) - 2 * self.keep_chars
+            self._replace_result(
+                index,
+                result[:self.keep_chars]
+                + f"\n[... {elided} {ELIDED_MARKER} ...]\n"
+                + result[-self.keep_chars:],
+            )
+            total -= before - self.message_tokens(self.messages[index])
+
+    def _replace_result(self, index, text):
+        from google.genai import types
+
+        message = self.messages[index]
+        response = message.parts[0].function_response
+        before = message_chars(message)
+        key = "error" if "error" in (response.response or {}) else "result"
+        self.messages[index] = types.Content(
+            role=message.role,
+            parts=[
+                types.Part.from_function_response(
+                    name=response.name, response={key: text}
+                )
+            ],
+        )
+        self.chars_saved += before - message_chars(self.messages[index])
+
+
+def message_chars(message):
+    chars = 0
+    for part in message.parts or []:
+        if part.text:
+            chars += len(part.text)
+        if part.function_call:
+            chars += len(part.function_call.name or "") + len(str(part.function_call.args))
+        if part.function_response:
+            chars += len(part.function_response.name or "")
+            chars += len(str(part.function_response.response))
+    return chars
+
+
+def _result_text(message):
+    response = message.parts[0].function_response.response or {}
+    return str(response.get("result", response.get("error", "")))
+
+
+def _result_key(message):
+    return message.parts[0].function_response.name, _result_text(message)
@@ -1,14 +1,16 @@
 import sys
 import os
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
+import time
+from clients import make_client
 from functions.get_files_info import *
+from history import HistoryManager
+from tracing import DEFAULT_TRACE_FILE, Tracer
 
-load_dotenv()
+# The SDK (google.genai), asyncio and dotenv are imported where they are first
+# needed, so the usage-error path starts without them.
 
-api_key = os.environ.get("GEMINI_API_KEY")
-client = genai.Client(api_key=api_key)
+# Built on first use by get_client(); benchmarks may assign their own
+client = None
 
 system_prompt = """
 You are a helpful AI coding agent working with a calculator project.
@@ -19,85 +21,329 @@ When a user asks a question or makes a request, you should use the available fun
 - Read file contents (use get_file_content) 
 - Execute Python files with optional arguments (use run_python_file)
 - Write or overwrite files (use write_file)
+- Edit part of an existing file with search/replace edits or a unified diff (use edit_file)
+- Search file contents or find Python definitions (use search_code)
 
 Always start by exploring the project structure to understand what you're working with. All paths you provide should be relative to the working directory. You do not need to specify the working directory in your function calls as it is automatically injected for security reasons.
 
 Work step by step to fulfill the user's request. When you have completed the task, provide a clear summary of what you did.
 """
 
+MAX_PARALLEL_CALLS = 8
+
+
+def get_client():
+    global client
+    if client is None:
+        client = make_client(api_key=os.environ.get("GEMINI_API_KEY"))
+    return client
+
+
+def call_traced(function_call, verbose=False, tracer=None, working_directory=DEFAULT_WORKING_DIRECTORY):
+    # call_function, plus a trace record when tracing is on
+    if tracer is None:
+        return call_function(function_call, verbose=verbose, working_directory=working_directory)
+    started = time.perf_counter()
+    function_result = call_function(function_call, verbose=verbose, working_directory=working_directory)
+    tracer.record_tool(function_call, time.perf_counter() - started, function_result)
+    return function_result
+
+
+def run_function_calls(function_calls, verbose=False, tracer=None, working_directory=DEFAULT_WORKING_DIRECTORY):
+    """
+    Runs the function calls from one model turn and returns their results in call order.
+
+    Consecutive calls to functions in parallel_safe_functions are dispatched together
+    on a thread pool. Any other call (e.g. write_file) waits for the calls before it
+    to finish and runs on its own, so writes keep their original order. Pool threads
+    run each call in a copy of the caller's context, so context variables (such as
+    the daemon's per-session output) carry over.
+    """
+    import contextvars
+    from concurrent.futures import ThreadPoolExecutor
+
+    results = [None] * len(function_calls)
+    batch = []
+
+    def run_batch():
+        if len(batch) == 1:
+            results[batch[0]] = call_traced(function_calls[batch[0]], verbose, tracer, working_directory)
+        elif batch:
+            with ThreadPoolExecutor(max_workers=min(len(batch), MAX_PARALLEL_CALLS)) as executor:
+                contexts = [contextvars.copy_context() for _ in batch]
+                batch_results = executor.map(
+                    lambda index, context: context.run(
+                        call_traced, function_calls[index], verbose, tracer, working_directory
+                    ),
+                    batch,
+                    contexts,
+                )
+                for index, result in zip(batch, batch_results):
+                    results[index] = result
+        batch.clear()
+
+    for index, function_call in enumerate(function_calls):
+        if function_call.name in parallel_safe_functions:
+            batch.append(index)
+        else:
+            run_batch()
+            results[index] = call_traced(function_call, verbose, tracer, working_directory)
+    run_batch()
+
+    return results
+
+
+async def run_agent_stream(messages, user_prompt, verbose=False, tracer=None, working_directory=DEFAULT_WORKING_DIRECTORY):
+    """
+    Async agent loop built on the SDK's async client and streaming generation.
+    Returns the HistoryManager, like run_agent.
+
+    Text is printed as soon as each chunk arrives, and every function call is started
+    the moment it appears in the stream rather than after the full response. The
+    "Final response:" header goes before the first text of a turn only while that
+    turn has made no function call; text following a call is printed without it.
+    Calls outside parallel_safe_functions wait for all earlier calls, and later
+    calls wait for them, so writes keep their order. Results are appended in call
+    order.
+    """
+    import asyncio
+    from google.genai import types
+
+    async def dispatch(function_call, wait_for):
+        if wait_for:
+            await asyncio.gather(*wait_for)
+        return await asyncio.to_thread(call_traced, function_call, verbose, tracer, working_directory)
+
+    history = HistoryManager(messages)
+
+    for iteration in range(20):
+        try:
+            history.compact()
+            started = time.perf_counter()
+            stream = await get_client().aio.models.generate_content_stream(
+                model="gemini-2.0-flash-001",
+                contents=messages,
+                config=types.GenerateContentConfig(
+                    tools=[get_available_functions()],
+                    system_instruction=system_prompt
+                ),
+            )
+
+            parts = []
+            tasks = []
+            barrier = None
+            text_printed = False
+            line_open = False
+            usage_metadata = None
+
+            async for chunk in stream:
+                if chunk.usage_metadata:
+                    usage_metadata = chunk.usage_metadata
+                if not chunk.candidates or not chunk.candidates[0].content:
+                    continue
+
+                for part in chunk.candidates[0].content.parts or []:
+                    if part.function_call:
+                        if line_open:
+                            print()
+                            line_open = False
+                        parts.append(part)
+                        print(f" - Calling function: {part.function_call.name}")
+
+                        # Start the call now; only ordering constraints make it wait
+                        if part.function_call.name in parallel_safe_functions:
+                            wait_for = [barrier] if barrier else []
+                            tasks.append(asyncio.create_task(dispatch(part.function_call, wait_for)))
+                        else:
+                            barrier = asyncio.create_task(dispatch(part.function_call, list(tasks)))
+                            tasks.append(barrier)
+                    elif part.text:
+                        # Merge streamed text fragments into a single history part
+                        if parts and parts[-1].text is not None:
+                            parts[-1] = types.Part(text=parts[-1].text + part.text)
+                        else:
+                            parts.append(types.Part(text=part.text))
+                        if not text_printed and not tasks:
+                            print("Final response:")
+                        text_printed = True
+                        print(part.text, end="", flush=True)
+                        line_open = True
+
+            if line_open:
+                print()
+            if tracer:
+                tracer.record_model(
+                    iteration + 1, time.perf_counter() - started, usage_metadata,
+                    len(messages), history.total_tokens(),
+                )
+            history.record_usage(usage_metadata)
+            if parts:
+                messages.append(types.Content(role="model", parts=parts))
+
+            # If function calls were made, wait for them and continue the loop
+            if tasks:
+                for function_result in await asyncio.gather(*tasks):
+                    messages.append(function_result)
+
+                    if verbose and function_result.parts[0].function_response.response:
+                        print(f"-> {function_result.parts[0].function_response.response}")
+                continue
+
+            if text_printed:
+                if verbose and usage_metadata:
+                    print(f"\nUser prompt: {user_prompt}")
+                    print(f"Prompt tokens: {usage_metadata.prompt_token_count}")
+                    print(f"Response tokens: {usage_metadata.candidates_token_count}")
+                    print(f"Tokens saved by history compaction: {history.tokens_saved}")
+                    print(f"Tool cache: {result_cache.summary()}")
+                    if get_python_pool() is not None:
+                        print(f"Warm Python pool: {get_python_pool().summary()}")
+                    if tracer:
+                        print(f"Trace: run {tracer.run_id} appended to {tracer.path}")
+                    print(f"Iterations completed: {iteration + 1}")
+                break
+
+            # If no function calls and no text, we're stuck
+            print(f"Warning: No text or function call returned in iteration {iteration + 1}")
+            break
+
+        except Exception as e:
+            print(f"Error in iteration {iteration + 1}: {e}")
+            break
+    else:
+        # Loop completed without breaking (hit max iterations)
+        print("Warning: Reached maximum iterations (20) without completion")
+    return history
+
+
+def run_agent(messages, user_prompt, verbose=False, tracer=None, working_directory=DEFAULT_WORKING_DIRECTORY):
+    """
+    Synchronous agent loop: one generate_content call per iteration, with the calls
+    of each turn run by run_function_calls. Returns the HistoryManager, whose
+    messages are the final conversation.
+    """
+    from google.genai import types
+
+    # Keeps the prompt within budget by compacting old tool output
+    history = HistoryManager(messages)
+
+    # Main agent loop - up to 20 iterations
+    for iteration in range(20):
+        try:
+            # Generate content with the compacted conversation history
+            history.compact()
+            started = time.perf_counter()
+            response = get_client().models.generate_content(
+                model="gemini-2.0-flash-001",
+                contents=messages,
+                config=types.GenerateContentConfig(
+                    tools=[get_available_functions()], 
+                    system_instruction=system_prompt
+                ),
+            )
+            if tracer:
+                tracer.record_model(
+                    iteration + 1, time.perf_counter() - started, response.usage_metadata,
+                    len(messages), history.total_tokens(),
+                )
+            history.record_usage(response.usage_metadata)
+
+            # Handle function calls first - check candidates for function calls
+            function_calls_found = False
+            for candidate in response.candidates:
+                if candidate.content:
+                    # Add candidate content to messages
+                    messages.append(candidate.content)
+                    
+                    # Collect the function calls in this candidate
+                    function_calls = []
+                    for part in candidate.content.parts:
+                        if hasattr(part, 'function_call') and part.function_call:
+                            function_calls.append(part.function_call)
+                            
+                            # Print the function call - this is what the test expects!
+                            print(f" - Calling function: {part.function_call.name}")
+
+                    if function_calls:
+                        function_calls_found = True
+
+                    # Independent calls run concurrently; results come back in call order
+                    for function_result in run_function_calls(function_calls, verbose=verbose, tracer=tracer, working_directory=working_directory):
+                        messages.append(function_result)
+                            
+                        if verbose and function_result.parts[0].function_response.response:
+                            print(f"-> {function_result.parts[0].function_response.response}")
+
+            # If function calls were found, continue the loop
+            if function_calls_found:
+                continue
+
+            # Check if we have a final text response (only if no function calls)
+            if response.text:
+                print("Final response:")
+                print(response.text)
+                if verbose:
+                    X = response.usage_metadata.prompt_token_count
+                    Y = response.usage_metadata.candidates_token_count
+                    print(f"\nUser prompt: {user_prompt}")
+                    print(f"Prompt tokens: {X}")
+                    print(f"Response tokens: {Y}")
+                    print(f"Tokens saved by history compaction: {history.tokens_saved}")
+                    print(f"Tool cache: {result_cache.summary()}")
+                    if get_python_pool() is not None:
+                        print(f"Warm Python pool: {get_python_pool().summary()}")
+                    if tracer:
+                        print(f"Trace: run {tracer.run_id} appended to {tracer.path}")
+                    print(f"Iterations completed: {iteration + 1}")
+                break
+
+            # If no function calls and no text, we're stuck
+            print(f"Warning: No text or function call returned in iteration {iteration + 1}")
+            break
+                
+        except Exception as e:
+            print(f"Error in iteration {iteration + 1}: {e}")
+            break
+    else:
+        # Loop completed without breaking (hit max iterations)
+        print("Warning: Reached maximum iterations (20) without completion")
+
+    return history
+
+
 def main():
     try: 
         user_prompt = " ".join(sys.argv[1:])
         verbose = "--verbose" in user_prompt
+        stream = "--stream" in user_prompt
         
         if len(user_prompt.strip()) < 2:
             raise IndexError("No prompt provided")
+
+        from dotenv import load_dotenv
+        from google.genai import types
+
+        load_dotenv()
+
+        # Append per-call timings and token counts to a JSONL trace
+        tracer = None
+        if "--trace" in user_prompt:
+            tracer = Tracer(os.environ.get("AGENT_TRACE_FILE", DEFAULT_TRACE_FILE))
+
+        # Run scripts in warm, pre-started interpreters instead of fresh ones
+        if "--warm-pool" in user_prompt:
+            enable_python_pool()
         
         # Initialize messages with the user prompt
         messages = [types.Content(role="user", parts=[types.Part(text=user_prompt)])]
-        
-        # Main agent loop - up to 20 iterations
-        for iteration in range(20):
-            try:
-                # Generate content with the full conversation history
-                response = client.models.generate_content(
-                    model="gemini-2.0-flash-001",
-                    contents=messages,
-                    config=types.GenerateContentConfig(
-                        tools=[available_functions], 
-                        system_instruction=system_prompt
-                    ),
-                )
 
-                # Handle function calls first - check candidates for function calls
-                function_calls_found = False
-                for candidate in response.candidates:
-                    if candidate.content:
-                        # Add candidate content to messages
-                        messages.append(candidate.content)
-                        
-                        # Check for function calls in this candidate
-                        for part in candidate.content.parts:
-                            if hasattr(part, 'function_call') and part.function_call:
-                                function_calls_found = True
-                                function_call = part.function_call
-                                
-                                # Print the function call - this is what the test expects!
-                                print(f" - Calling function: {function_call.name}")
-                                
-                                function_result = call_function(function_call, verbose=verbose)
-                                messages.append(function_result)
-                                
-                                if verbose and function_result.parts[0].function_response.response:
-                                    print(f"-> {function_result.parts[0].function_response.response}")
-
-                # If function calls were found, continue the loop
-                if function_calls_found:
-                    continue
+        if stream:
+            import asyncio
 
-                # Check if we have a final text response (only if no function calls)
-                if response.text:
-                    print("Final response:")
-                    print(response.text)
-                    if verbose:
-                        X = response.usage_metadata.prompt_token_count
-                        Y = response.usage_metadata.candidates_token_count
-                        print(f"\nUser prompt: {user_prompt}")
-                        print(f"Prompt tokens: {X}")
-                        print(f"Response tokens: {Y}")
-                        print(f"Iterations completed: {iteration + 1}")
-                    break
-
-                # If no function calls and no text, we're stuck
-                print(f"Warning: No text or function call returned in iteration {iteration + 1}")
-                break
-                    
-            except Exception as e:
-                print(f"Error in iteration {iteration + 1}: {e}")
-                break
-        else:
-            # Loop completed without breaking (hit max iterations)
-            print("Warning: Reached maximum iterations (20) without completion")
+            asyncio.run(run_agent_stream(messages, user_prompt, verbose=verbose, tracer=tracer))
+            return
+
+        run_agent(messages, user_prompt, verbose=verbose, tracer=tracer)
 
     except IndexError:
         print("Please provide a prompt as a command-line argument.")
@@ -0,0 +1,608 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import re
+import stat
+import subprocess
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from google.genai import types
+
+import main as agent
+from daemon import AgentDaemon
+from clients import ReplayClient
+from functions.code_index import CodeIndex
+from functions.get_files_info import (
+    MAX_ENTRIES, MAX_OUTPUT_BYTES, ResultCache, get_file_content, get_files_info, result_cache, run_python_file,
+    search_code, write_file,
+)
+from functions.output_capture import STOP_AFTER_BYTES, CappedOutput, read_streams
+from functions.python_pool import WarmPythonPool
+from functions.patching import apply_search_replace, apply_unified_diff, atomic_write
+from history import ELIDED_MARKER, HistoryManager, message_chars
+
+
+class TestSearchReplace(unittest.TestCase):
+
+    def test_edits_apply_in_order(self):
+        text = "a = 1\nb = 2\n"
+        edits = [{"search": "a = 1", "replace": "a = 3"}, {"search": "a = 3\nb", "replace": "a = 4\nc"}]
+        self.assertEqual(apply_search_replace(text, edits), "a = 4\nc = 2\n")
+
+    def test_missing_search_text(self):
+        with self.assertRaisesRegex(ValueError, "not found"):
+            apply_search_replace("a = 1\n", [{"search": "b", "replace": "c"}])
+
+    def test_ambiguous_search_text(self):
+        with self.assertRaisesRegex(ValueError, "matches 2 times"):
+            apply_search_replace("x\nx\n", [{"search": "x", "replace": "y"}])
+
+    def test_empty_search_text(self):
+        with self.assertRaisesRegex(ValueError, "empty"):
+            apply_search_replace("x\n", [{"search": "", "replace": "y"}])
+
+
+class TestUnifiedDiff(unittest.TestCase):
+
+    def test_hunk_applies_at_stated_line(self):
+        text = "one\ntwo\nthree\n"
+        diff = "--- a/f\n+++ b/f\n@@ -1,3 +1,3 @@\n one\n-two\n+TWO\n three\n"
+        self.assertEqual(apply_unified_diff(text, diff), ("one\nTWO\nthree\n", 1))
+
+    def test_hunk_is_found_when_lines_shifted(self):
+        text = "new\nlines\non top\none\ntwo\nthree\n"
+        diff = "@@ -1,3 +1,3 @@\n one\n-two\n+TWO\n three\n"
+        new_text, _ = apply_unified_diff(text, diff)
+        self.assertEqual(new_text, "new\nlines\non top\none\nTWO\nthree\n")
+
+    def test_nearest_match_wins(self):
+        text = "x\ny\nx\ny\nx\ny\n"
+        diff = "@@ -5,2 +5,2 @@\n x\n-y\n+z\n"
+        new_text, _ = apply_unified_diff(text, diff)
+        self.assertEqual(new_text, "x\ny\nx\ny\nx\nz\n")
+
+    def test_crlf_line_endings_are_kept(self):
+        text = "one\r\ntwo\r\nthree\r\n"
+        diff = "@@ -2 +2 @@\n-two\n+TWO\n"
+        new_text, _ = apply_unified_diff(text, diff)
+        self.assertEqual(new_text, "one\r\nTWO\r\nthree\r\n")
+
+    def test_missing_final_newline_is_kept(self):
+        text = "one\ntwo"
+        diff = "@@ -2 +2 @@\n-two\n+TWO\n\\ No newline at end of file\n"
+        new_text, _ = apply_unified_diff(text, diff)
+        self.assertEqual(new_text, "one\nTWO")
+
+    def test_insertion_after_last_line_without_newline(self):
+        new_text, _ = apply_unified_diff("a\nb", "@@ -2,0 +3 @@\n+c\n")
+        self.assertEqual(new_text, "a\nb\nc")
+        new_text, _ = apply_unified_diff("a\r\nb", "@@ -2,0 +3 @@\n+c\n")
+        self.assertEqual(new_text, "a\r\nb\r\nc")
+
+    def test_insertion_with_empty_old_side(self):
+        new_text, _ = apply_unified_diff("a\nb\n", "@@ -1,0 +2 @@\n+inserted\n")
+        self.assertEqual(new_text, "a\ninserted\nb\n")
+
+    def test_mismatch_names_the_differing_line(self):
+        text = "one\ntwo\nthree\n"
+        diff = "@@ -1,3 +1,3 @@\n one\n-deux\n+TWO\n three\n"
+        with self.assertRaisesRegex(ValueError, r"hunk 1 .*'deux' at line 2, found 'two'"):
+            apply_unified_diff(text, diff)
+
+    def test_diff_without_hunks(self):
+        with self.assertRaisesRegex(ValueError, "no hunks"):
+            apply_unified_diff("a\n", "--- a/f\n+++ b/f\n")
+
+
+class TestAtomicWrite(unittest.TestCase):
+
+    def test_new_file_gets_umask_default_mode(self):
+        mask = os.umask(0o022)
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "new.txt")
+                atomic_write(path, "hello\n")
+                self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o644)
+                with open(path, "r") as f:
+                    self.assertEqual(f.read(), "hello\n")
+        finally:
+            os.umask(mask)
+
+    def test_existing_file_keeps_its_mode(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "script.py")
+            with open(path, "w") as f:
+                f.write("old\n")
+            os.chmod(path, 0o755)
+            atomic_write(path, "new\n")
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o755)
+            self.assertEqual(os.listdir(directory), ["script.py"])
+
+
+class TestGetFileContent(unittest.TestCase):
+
+    def test_pages_smaller_than_a_character_still_advance(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "text.txt"), "w", encoding="utf-8") as f:
+                f.write("aé€😀")
+            pages = []
+            offset = 0
+            while True:
+                page = get_file_content(directory, "text.txt", offset=offset, length=1)
+                text, _, note = page.partition("[...")
+                pages.append(text)
+                if not note:
+                    break
+                offset = int(note.split("offset=")[1].split()[0])
+            self.assertEqual(pages, ["a", "é", "€", "😀"])
+
+
+class TestGetFilesInfo(unittest.TestCase):
+
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.directory = temp.name
+        files = {
+            ".gitignore": "build/\n*.log\n",
+            "main.py": "print()\n",
+            "debug.log": "",
+            "build/out.py": "",
+            "pkg/__init__.py": "",
+            "pkg/render.py": "",
+            "pkg/sub/deep.py": "",
+            ".git/HEAD": "",
+        }
+        for name, content in files.items():
+            path = os.path.join(self.directory, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(content)
+
+    def names(self, **kwargs):
+        listing = get_files_info(self.directory, **kwargs)
+        return [line[2:].split(":")[0] for line in listing.splitlines() if line.startswith("- ")]
+
+    def test_top_level_listing_ignores_nothing(self):
+        self.assertEqual(
+            self.names(),
+            [".git", ".gitignore", "build", "debug.log", "main.py", "pkg"],
+        )
+
+    def test_recursive_listing_skips_gitignored_paths(self):
+        self.assertEqual(
+            self.names(recursive=True),
+            [".gitignore", "main.py", "pkg", "pkg/__init__.py", "pkg/render.py", "pkg/sub", "pkg/sub/deep.py"],
+        )
+
+    def test_ignore_files_can_be_disabled(self):
+        names = self.names(recursive=True, use_ignore_files=False)
+        self.assertIn("build/out.py", names)
+        self.assertIn(".git/HEAD", names)
+
+    def test_max_depth(self):
+        names = self.names(recursive=True, max_depth=1)
+        self.assertIn("pkg/sub", names)
+        self.assertNotIn("pkg/sub/deep.py", names)
+
+    def test_include_and_exclude_globs(self):
+        self.assertEqual(
+            self.names(recursive=True, include=["*.py"], exclude=["sub"]),
+            ["main.py", "pkg/__init__.py", "pkg/render.py"],
+        )
+
+    def test_sizes_come_from_the_entries(self):
+        self.assertIn("- main.py: file_size=8 bytes, is_dir=False", get_files_info(self.directory))
+
+    def test_pages_through_offset_and_limit(self):
+        first = get_files_info(self.directory, recursive=True, limit=3)
+        self.assertIn("offset=3", first.splitlines()[-1])
+        pages = self.names(recursive=True, limit=3) + self.names(recursive=True, offset=3, limit=3)
+        pages += self.names(recursive=True, offset=6, limit=3)
+        self.assertEqual(pages, self.names(recursive=True))
+
+    def test_limit_is_capped(self):
+        many = os.path.join(self.directory, "many")
+        os.mkdir(many)
+        for i in range(MAX_ENTRIES + 5):
+            open(os.path.join(many, f"{i:04}.txt"), "w").close()
+        lines = get_files_info(self.directory, "many", limit=10 * MAX_ENTRIES).splitlines()
+        self.assertEqual(len(lines), MAX_ENTRIES + 1)
+        self.assertIn(f"offset={MAX_ENTRIES}", lines[-1])
+
+    def test_directory_outside_working_directory(self):
+        self.assertTrue(get_files_info(self.directory, "..").startswith("Error: Cannot list"))
+
+
+class TestCodeIndex(unittest.TestCase):
+
+    FILES = {
+        "calc.py": "class Calculator:\n    def evaluate(self, expression):\n        return expression\n",
+        "pkg/render.py": "def render(expression, result):\n    return f'{expression} = {result}'\n\nWIDTH = 80\n",
+        "notes.txt": "Evaluate EXPRESSIONS here.\nab\nxyz 123\n",
+        "__pycache__/calc.pyc": "def evaluate\n",
+    }
+
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.directory = temp.name
+        for name, content in self.FILES.items():
+            self.write(name, content)
+        self.index = CodeIndex(self.directory)
+        self.index.refresh()
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def scan(self, pattern, ignore_case=False):
+        # Every line of every indexed file, without the trigram filter
+        regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        return sorted(
+            (path, number, line)
+            for path, entry in self.index.files.items()
+            for number, line in enumerate(entry["lines"], start=1)
+            if regex.search(line)
+        )
+
+    def test_trigram_filter_matches_a_full_scan(self):
+        patterns = [
+            "evaluate", "Evaluate", "def \\w+", "expression\\b", "express(ion|ions)",
+            "render|WIDTH", "\\d+", "a.c", "ab", "x?yz", "re[ns]der", "no such text",
+        ]
+        for pattern in patterns:
+            for ignore_case in (False, True):
+                matches, total = self.index.search(pattern, ignore_case=ignore_case, max_results=1000)
+                expected = self.scan(pattern, ignore_case)
+                self.assertEqual(sorted(matches), expected, (pattern, ignore_case))
+                self.assertEqual(total, len(expected))
+
+    def test_literal_pattern_skips_other_files(self):
+        self.assertEqual(self.index._candidates("WIDTH = 80"), {os.path.join("pkg", "render.py")})
+        self.assertEqual(self.index._candidates("\\w+"), set(self.index.files))
+
+    def test_skipped_directories_are_not_indexed(self):
+        self.assertNotIn(os.path.join("__pycache__", "calc.pyc"), self.index.files)
+
+    def test_symbols(self):
+        symbols, total = self.index.find_symbols("evaluate")
+        self.assertEqual(symbols, [("calc.py", 2, "method", "Calculator.evaluate")])
+        symbols, _ = self.index.find_symbols("render")
+        self.assertEqual(symbols[0], (os.path.join("pkg", "render.py"), 1, "function", "render"))
+        self.assertEqual(
+            search_code(self.directory, "WIDTH", kind="symbol"),
+            f"{os.path.join('pkg', 'render.py')}:4: variable WIDTH",
+        )
+
+    def test_refresh_picks_up_changes(self):
+        self.write("calc.py", "def evaluate_all():\n    pass\n")
+        self.write("new.py", "def evaluate_one():\n    pass\n")
+        os.remove(os.path.join(self.directory, "notes.txt"))
+        self.index.refresh()
+
+        symbols, _ = self.index.find_symbols("evaluate")
+        self.assertEqual([symbol[3] for symbol in symbols], ["evaluate_all", "evaluate_one"])
+        self.assertNotIn("notes.txt", self.index.files)
+        self.assertEqual(self.index._candidates("class Calculator"), set())
+        matches, _ = self.index.search("Evaluate", ignore_case=True)
+        self.assertEqual([match[0] for match in matches], ["calc.py", "new.py"])
+
+    def test_search_code_reports_matches_and_errors(self):
+        self.assertEqual(search_code(self.directory, "WIDTH"), f"{os.path.join('pkg', 'render.py')}:4: WIDTH = 80")
+        self.assertEqual(search_code(self.directory, "zzz+q"), 'No matches for "zzz+q"')
+        self.assertTrue(search_code(self.directory, "(").startswith("Error: Invalid regular expression"))
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.directory = temp.name
+        self.path = os.path.join(self.directory, "notes.txt")
+        with open(self.path, "w") as f:
+            f.write("one\n")
+
+    def counts(self):
+        return result_cache.hits, result_cache.misses
+
+    def test_repeated_read_is_a_hit(self):
+        hits, misses = self.counts()
+        self.assertEqual(get_file_content(self.directory, "notes.txt"), "one\n")
+        self.assertEqual(get_file_content(self.directory, "notes.txt"), "one\n")
+        self.assertEqual(self.counts(), (hits + 1, misses + 1))
+
+    def test_different_page_is_a_miss(self):
+        get_file_content(self.directory, "notes.txt")
+        hits, misses = self.counts()
+        self.assertEqual(get_file_content(self.directory, "notes.txt", offset=1), "ne\n")
+        self.assertEqual(self.counts(), (hits, misses + 1))
+
+    def test_external_modification_misses(self):
+        get_file_content(self.directory, "notes.txt")
+        with open(self.path, "a") as f:
+            f.write("two\n")
+        self.assertEqual(get_file_content(self.directory, "notes.txt"), "one\ntwo\n")
+
+    def test_write_file_invalidates(self):
+        get_file_content(self.directory, "notes.txt")
+        write_file(self.directory, "notes.txt", "ONE\n")
+        self.assertEqual(get_file_content(self.directory, "notes.txt"), "ONE\n")
+
+    def test_listing_shows_sizes_changed_outside_the_tools(self):
+        self.assertIn("notes.txt: file_size=4 bytes", get_files_info(self.directory))
+        with open(self.path, "a") as f:
+            f.write("two\n")
+        self.assertIn("notes.txt: file_size=8 bytes", get_files_info(self.directory))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ResultCache(max_entries=2)
+        cache.put(("t", "a"), "A")
+        cache.put(("t", "b"), "B")
+        cache.get(("t", "a"))
+        cache.put(("t", "c"), "C")
+        self.assertIsNone(cache.get(("t", "b")))
+        self.assertEqual(cache.get(("t", "a")), "A")
+        self.assertEqual(cache.evictions, 1)
+
+
+class TestOutputCapture(unittest.TestCase):
+
+    def test_short_output_is_kept_whole(self):
+        output = CappedOutput(10)
+        output.feed(b"hello")
+        self.assertEqual(output.text(), "hello")
+
+    def test_long_output_keeps_head_and_tail(self):
+        output = CappedOutput(10)
+        for chunk in (b"abc", b"defghij", b"klmnopqrstuvwxyz"):
+            output.feed(chunk)
+        self.assertEqual(output.total, 26)
+        self.assertEqual(output.elided, 16)
+        self.assertEqual(output.text(), "abcde\n[... 16 bytes of output elided ...]\nvwxyz")
+
+    def test_reading_stops_at_the_output_limit(self):
+        process = subprocess.Popen(
+            [sys.executable, "-c", "while True: print('x' * 1000)"], stdout=subprocess.PIPE
+        )
+        with process:
+            (output,), stopped = read_streams([process.stdout.fileno()], 100, 10, stop_after_bytes=100_000)
+            process.kill()
+        self.assertEqual(stopped, "output_limit")
+        self.assertGreater(output.total, 100_000)
+        self.assertLess(output.total, 100_000 + 65536 + 1)
+
+    def run_script(self, source, **kwargs):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        directory = temp.name
+        with open(os.path.join(directory, "script.py"), "w") as f:
+            f.write(source)
+        return directory, run_python_file(directory, "script.py", **kwargs)
+
+    def test_chatty_script_is_killed(self):
+        directory, result = self.run_script(
+            "import os\n"
+            "with open('pid', 'w') as f:\n"
+            "    f.write(str(os.getpid()))\n"
+            "while True:\n"
+            "    print('x' * 1000)\n"
+        )
+        self.assertTrue(result.startswith(f"Error: The Python script was stopped after printing more than {STOP_AFTER_BYTES}"))
+        with open(os.path.join(directory, "pid")) as f:
+            pid = int(f.read())
+        with self.assertRaises(ProcessLookupError):
+            os.kill(pid, 0)
+
+    def test_requested_output_size_is_capped(self):
+        _, result = self.run_script("print('x' * 200_000)\n", max_output_bytes=10**9)
+        stdout = result.split("STDOUT:\n", 1)[1].split("\nSTDERR:", 1)[0]
+        self.assertIn("bytes of output elided", stdout)
+        self.assertLess(len(stdout), MAX_OUTPUT_BYTES + 100)
+
+    def test_timeout_after_pipes_close(self):
+        _, result = self.run_script(
+            "import os, sys, time\nos.close(1)\nos.close(2)\ntime.sleep(5)\n", timeout=0.5
+        )
+        self.assertTrue(result.startswith("Error: The Python script timed out after 0.5 seconds"))
+
+
+class TestWarmPythonPool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = WarmPythonPool(size=1, python=sys.executable)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def assert_matches_subprocess(self, source, args=()):
+        with tempfile.TemporaryDirectory() as directory:
+            script = os.path.join(directory, "script.py")
+            with open(script, "w") as f:
+                f.write(source)
+            cold = subprocess.run(
+                [sys.executable, script, *args], cwd=directory, capture_output=True, text=True, timeout=10
+            )
+            warm = self.pool.run(script, args, directory, timeout=10, max_output_bytes=10000)
+        self.assertEqual(
+            (warm["stdout"], warm["stderr"], warm["returncode"]),
+            (cold.stdout, cold.stderr, cold.returncode),
+        )
+
+    def test_threads_and_atexit_handlers_run_before_exit(self):
+        self.assert_matches_subprocess(
+            "import atexit, threading, time\n"
+            "atexit.register(print, 'atexit ran')\n"
+            "def work():\n"
+            "    time.sleep(0.1)\n"
+            "    print('thread done')\n"
+            "threading.Thread(target=work).start()\n"
+            "print('main')\n"
+        )
+
+    def test_arguments_and_exit_code(self):
+        self.assert_matches_subprocess(
+            "import sys\nprint(sys.argv[1:])\nsys.exit(3)\n", ["a", "b"]
+        )
+
+
+class TestAgentDaemon(unittest.TestCase):
+
+    def test_socket_is_private_from_creation(self):
+        with tempfile.TemporaryDirectory() as directory:
+            fixture = os.path.join(directory, "fixture.json")
+            with open(fixture, "w") as f:
+                json.dump({"prompt": "q", "turns": []}, f)
+            saved_client = agent.client
+            self.addCleanup(setattr, agent, "client", saved_client)
+            agent.client = ReplayClient(fixture)
+
+            class ProbedDaemon(AgentDaemon):
+                # The socket's mode the moment bind() has created it
+                def server_bind(self):
+                    super().server_bind()
+                    self.bound_mode = stat.S_IMODE(os.stat(self.server_address).st_mode)
+
+            mask = os.umask(0)
+            try:
+                daemon = ProbedDaemon(os.path.join(directory, "agent.sock"))
+            finally:
+                os.umask(mask)
+            try:
+                self.assertEqual(daemon.bound_mode & 0o077, 0)
+                self.assertEqual(os.umask(mask), mask)
+            finally:
+                daemon.server_close()
+            self.assertFalse(os.path.exists(os.path.join(directory, "agent.sock")))
+
+
+def tool_message(name, result):
+    return types.Content(
+        role="tool",
+        parts=[types.Part.from_function_response(name=name, response={"result": result})],
+    )
+
+
+def result_of(message):
+    return message.parts[0].function_response.response["result"]
+
+
+class TestHistoryManager(unittest.TestCase):
+
+    def test_repeated_result_is_replaced_by_note(self):
+        listing = "- main.py: file_size=100 bytes, is_dir=False\n" * 5
+        messages = [
+            tool_message("get_files_info", listing),
+            tool_message("get_file_content", "x = 1"),
+            tool_message("get_files_info", listing),
+        ]
+        history = HistoryManager(messages, keep_recent=1)
+        history.compact()
+        self.assertEqual(result_of(messages[0]), "[Identical to a later get_files_info result; see below]")
+        self.assertEqual(result_of(messages[2]), listing)
+        self.assertGreater(history.chars_saved, 0)
+
+    def test_old_results_are_truncated_to_head_and_tail(self):
+        result = "a" * 1000 + "b" * 1000 + "c" * 1000
+        messages = [tool_message("get_file_content", result), tool_message("get_file_content", "short")]
+        history = HistoryManager(messages, token_budget=100, keep_recent=1, keep_chars=50)
+        history.compact()
+        truncated = result_of(messages[0])
+        self.assertTrue(truncated.startswith("a" * 50 + "\n"))
+        self.assertTrue(truncated.endswith("\n" + "c" * 50))
+        self.assertIn(f"2900 {ELIDED_MARKER}", truncated)
+
+    def test_recent_results_are_kept(self):
+        results = [str(i) * 2000 for i in range(4)]
+        messages = [tool_message("get_file_content", result) for result in results]
+        history = HistoryManager(messages, token_budget=10, keep_recent=2, keep_chars=50)
+        history.compact()
+        self.assertLess(len(result_of(messages[1])), 2000)
+        self.assertEqual([result_of(message) for message in messages[2:]], results[2:])
+
+    def test_ratio_excludes_fixed_prompt_overhead(self):
+        # 1 token per 3 characters of history, plus 500 tokens of system
+        # instruction and tool declarations on every call
+        messages = [tool_message("get_file_content", "x" * 3000)]
+        history = HistoryManager(messages)
+        history.record_usage(SimpleNamespace(prompt_token_count=500 + message_chars(messages[0]) // 3))
+        messages.append(tool_message("get_file_content", "y" * 3000))
+        chars = sum(message_chars(message) for message in messages)
+        history.record_usage(SimpleNamespace(prompt_token_count=500 + chars // 3))
+        self.assertAlmostEqual(history.tokens_per_char, 1 / 3, places=3)
+        self.assertAlmostEqual(history.overhead_tokens, 500, delta=2)
+
+
+def text_chunk(text):
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+
+class TestRunAgentStream(unittest.TestCase):
+
+    def setUp(self):
+        self.saved_client = agent.client
+        self.addCleanup(setattr, agent, "client", self.saved_client)
+
+    def replay(self, turns):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump({"prompt": "q", "turns": turns}, f)
+        self.addCleanup(os.unlink, f.name)
+        agent.client = ReplayClient(f.name)
+        return agent.client
+
+    def test_final_text_is_printed_while_streaming(self):
+        client = self.replay([[text_chunk("The answer "), text_chunk("is 8.")]])
+        output = io.StringIO()
+        seen = []
+
+        # Note what was already printed each time the loop asks for another chunk
+        replay_stream = client.aio.models.generate_content_stream
+
+        async def observed_stream(**kwargs):
+            chunks = await replay_stream(**kwargs)
+
+            async def observed():
+                async for chunk in chunks:
+                    seen.append(output.getvalue())
+                    yield chunk
+                seen.append(output.getvalue())
+
+            return observed()
+
+        client.aio.models.generate_content_stream = observed_stream
+        messages = [types.Content(role="user", parts=[types.Part(text="q")])]
+        with contextlib.redirect_stdout(output):
+            asyncio.run(agent.run_agent_stream(messages, "q"))
+
+        self.assertEqual(seen[1], "Final response:\nThe answer ")
+        self.assertTrue(output.getvalue().startswith("Final response:\nThe answer is 8.\n"))
+        self.assertEqual(messages[-1].parts[0].text, "The answer is 8.")
+
+    def test_text_after_a_call_has_no_header(self):
+        call = {"candidates": [{"content": {"role": "model", "parts": [
+            {"function_call": {"name": "get_files_info", "args": {"directory": "."}}}
+        ]}}]}
+        self.replay([[call, text_chunk("Listing...")], [text_chunk("Done.")]])
+        output = io.StringIO()
+        messages = [types.Content(role="user", parts=[types.Part(text="q")])]
+        with contextlib.redirect_stdout(output):
+            asyncio.run(agent.run_agent_stream(messages, "q"))
+
+        printed = output.getvalue()
+        self.assertEqual(printed.count("Final response:"), 1)
+        self.assertIn("Listing...\n", printed)
+        self.assertIn("Final response:\nDone.\n", printed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+
+# Where --trace writes, unless AGENT_TRACE_FILE says otherwise
+DEFAULT_TRACE_FILE = "agent_traces.jsonl"
+
+# USD per million tokens for gemini-2.0-flash, used for the cost estimate
+PROMPT_PRICE_PER_MILLION = 0.10
+CANDIDATE_PRICE_PER_MILLION = 0.40
+
+
+class Tracer:
+    """
+    Appends one JSON line per model call and per tool call of an agent run.
+
+    Model records carry the wall time of the generate_content call, its prompt and
+    candidate token counts and the size of the history that was sent; tool records
+    carry the tool name, wall time and the sizes of the arguments and of the result.
+    Every record is tagged with the run id, so one file can hold many runs. Tool
+    calls may finish on worker threads, so writes are serialized with a lock.
+
+    Args:
+        path (str): The JSONL file to append to.
+    """
+
+    def __init__(self, path=DEFAULT_TRACE_FILE):
+        self.path = path
+        self.run_id = time.strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}"
+        self.lock = threading.Lock()
+
+    def record_model(self, iteration, seconds, usage_metadata, history_messages, history_tokens):
+        self._write({
+            "type": "model",
+            "iteration": iteration,
+            "seconds": seconds,
+            "prompt_tokens": getattr(usage_metadata, "prompt_token_count", None) or 0,
+            "candidate_tokens": getattr(usage_metadata, "candidates_token_count", None) or 0,
+            "history_messages": history_messages,
+            "history_tokens": history_tokens,
+        })
+
+    def record_tool(self, function_call, seconds, function_result):
+        response = function_result.parts[0].function_response.response or {}
+        self._write({
+            "type": "tool",
+            "tool": function_call.name,
+            "seconds": seconds,
+            "args_chars": len(json.dumps(dict(function_call.args or {}), default=str)),
+            "result_chars": len(str(response.get("result", response.get("error", "")))),
+            "error": "error" in response,
+        })
+
+    def _write(self, record):
+        record = {"run": self.run_id, "time": time.time(), **record}
+        line = json.dumps(record) + "\n"
+        with self.lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile of an unsorted list
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def cost(prompt_tokens, candidate_tokens):
+    return (
+        prompt_tokens * PROMPT_PRICE_PER_MILLION
+        + candidate_tokens * CANDIDATE_PRICE_PER_MILLION
+    ) / 1_000_000
+
+
+def summarize(records):
+    """
+    Aggregates trace records into per-run totals and per-tool latency percentiles.
+
+    Args:
+        records (list): Parsed records from a trace file.
+
+    Returns:
+        tuple: (runs, timings) where runs maps each run id to its totals and timings
+            maps "model" and every tool name to the list of call durations.
+    """
+    runs = {}
+    timings = defaultdict(list)
+    for record in records:
+        run = runs.setdefault(record["run"], {
+            "model_calls": 0,
+            "tool_calls": 0,
+            "model_seconds": 0.0,
+            "tool_seconds": 0.0,
+            "prompt_tokens": 0,
+            "candidate_tokens": 0,
+            "start": record["time"],
+            "end": record["time"],
+        })
+        run["start"] = min(run["start"], record["time"] - record["seconds"])
+        run["end"] = max(run["end"], record["time"])
+        if record["type"] == "model":
+            run["model_calls"] += 1
+            run["model_seconds"] += record["seconds"]
+            run["prompt_tokens"] += record["prompt_tokens"]
+            run["candidate_tokens"] += record["candidate_tokens"]
+            timings["model"].append(record["seconds"])
+        else:
+            run["tool_calls"] += 1
+            run["tool_seconds"] += record["seconds"]
+            timings[record["tool"]].append(record["seconds"])
+
+    for run in runs.values():
+        run["cost"] = cost(run["prompt_tokens"], run["candidate_tokens"])
+    return runs, timings
+
+
+def print_summary(path):
+    with open(path, "r") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    runs, timings = summarize(records)
+
+    for run_id, run in runs.items():
+        print(
+            f"Run {run_id}: {run['end'] - run['start']:.2f} s wall, "
+            f"{run['model_calls']} model calls ({run['model_seconds']:.2f} s), "
+            f"{run['tool_calls']} tool calls ({run['tool_seconds']:.2f} s), "
+            f"{run['prompt_tokens']} prompt + {run['candidate_tokens']} candidate tokens, "
+            f"${run['cost']:.6f}"
+        )
+
+    print()
+    print(f"{'call':<20} {'count':>6} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, seconds in sorted(timings.items()):
+        print(
+            f"{name:<20} {len(seconds):>6} "
+            f"{1000 * percentile(seconds, 0.50):>9.1f} {1000 * percentile(seconds, 0.95):>9.1f}"
+        )
+
+    total_cost = sum(run["cost"] for run in runs.values())
+    print(f"\nTotal cost over {len(runs)} runs: ${total_cost:.6f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize agent trace files")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    summary = subcommands.add_parser("summary", help="p50/p95 per tool and cost per run")
+    summary.add_argument("path", nargs="?", default=os.environ.get("AGENT_TRACE_FILE", DEFAULT_TRACE_FILE))
+    args = parser.parse_args()
+
+    if args.command == "summary":
+        print_summary(args.path)
+
+
+if __name__ == "__main__":
+    main()